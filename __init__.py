@@ -15,14 +15,19 @@ def builder(dbg=False): # show the builder
   BUILDER_INSTANCE = cuiBuilder.CUIBuilder()
   BUILDER_INSTANCE.show()
 
-def viewer(tab=None, dbg=False): # show the viewer
+# show the viewer
+# timer=True => poll the attributes instead of watching them
+# canvas=True => paint all the selectors with a single widget (faster for big layouts)
+def viewer(tab=None, dbg=False, timer=False, canvas=False):
   global VIEWER_INSTANCES, DEBUG
   
   if dbg:
     DEBUG = True
     reload(cuiViewer)
   
-  new_instance = cuiViewer.CUIViewer(tab)
+  mode = cuiViewer.updates.UpdateMode.timer if timer else cuiViewer.updates.UpdateMode.event
+  renderMode = cuiViewer.widgets.RenderMode.canvas if canvas else cuiViewer.widgets.RenderMode.widgets
+  new_instance = cuiViewer.CUIViewer(tab, mode, renderMode)
   VIEWER_INSTANCES.append(new_instance)
   new_instance.show()
 
@@ -36,4 +41,6 @@ def kill(): # kill everything
 
   if VIEWER_INSTANCES:
     for instance in VIEWER_INSTANCES:
-      instance.deleteLater()
\ No newline at end of file
+      instance.deleteLater()
+
+  cuiViewer.updates.shutdown() # stop the shared update scheduler
\ No newline at end of file
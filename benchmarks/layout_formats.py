@@ -0,0 +1,63 @@
+'''
+Compares the JSON and the binary layout formats: file size, encoding and decoding time
+Headless, run from the repository root with the Python of Maya: mayapy benchmarks/layout_formats.py [controls...]
+'''
+
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # the modules import each other by name
+
+import layout
+import widgets
+
+SCRIPT = "import maya.cmds as cmds\ncmds.select({!r})\n" # typical command button code
+
+'''
+Returns a layout of ~count~ controls mixing the registered types the way the character layouts do
+(mostly selectors, scripts and tags repeated across the controls)
+'''
+def makeLayout(count):
+  types = list(widgets.CONTROL_TYPES.values())
+  controls = []
+  for cid in range(count):
+    controlClass = types[0] if cid % 4 else types[cid // 4 % len(types)] # 3 of 4 controls are of the first type
+    control = {"cid": cid, "pos_x": cid % 64 * 12, "pos_y": cid // 64 * 12}
+    for field in controlClass.FIELDS:
+      if field.kind == "string":
+        control[field.key] = SCRIPT.format("ctrl_{}".format(cid % 50)) if "cmd" in field.key else "obj_{}".format(cid % 200)
+      elif field.kind == "strings":
+        control[field.key] = ["char_{}".format(cid % 200), "side_{}".format(cid % 2)]
+      else:
+        control[field.key] = field.default
+    controls.append({controlClass.TYPE: control})
+
+  return {"name": "Benchmark", "window_width": 800, "window_height": 800, "background_image": None,
+          "last_cid": count, "controls": controls}
+
+'''
+Returns the best time of ~repeat~ runs of ~function~ in milliseconds
+'''
+def best(function, repeat=5):
+  return min(timeit.repeat(function, number=1, repeat=repeat)) * 1000
+
+def main(counts):
+  print("{:>8} {:>12} {:>12} {:>10} {:>10} {:>10} {:>10}".format(
+    "controls", "json bytes", "binary bytes", "json enc", "bin enc", "json dec", "bin dec"))
+  for count in counts:
+    data = makeLayout(count)
+    jsonData = layout.encode(data)
+    binaryData = layout.encode(data, binary=True)
+    assert json.loads(layout.encode(layout.fromBinary(binaryData)).decode("utf-8")) == json.loads(jsonData.decode("utf-8"))
+
+    print("{:>8} {:>12} {:>12} {:>8.1f}ms {:>8.1f}ms {:>8.1f}ms {:>8.1f}ms".format(
+      count, len(jsonData), len(binaryData),
+      best(lambda: layout.encode(data)),
+      best(lambda: layout.encode(data, binary=True)),
+      best(lambda: layout.validate(json.loads(jsonData.decode("utf-8")))),
+      best(lambda: layout.validate(layout.fromBinary(binaryData)))))
+
+if __name__ == "__main__":
+  main([int(arg) for arg in sys.argv[1:]] or [100, 1000, 5000])
@@ -0,0 +1,80 @@
+'''
+Compares the selector rendering modes (see widgets.RenderMode): load time, first paint time and memory
+Every case runs in a fresh process, so the memory numbers do not include the earlier cases
+Run from the repository root with the Python of Maya: mayapy benchmarks/render_modes.py [selectors...]
+Qt needs a display, on a headless Linux machine run it under xvfb-run
+'''
+
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # the modules import each other by name
+
+MODES = [("widgets", 0), ("canvas", 1)] # names and values of widgets.RenderMode
+SPACING = 24 # px between the selectors
+COLORS = ["#FF4040", "#40FF40", "#4040FF", "#FFFF40", "#40FFFF"]
+
+'''
+Returns the resident memory of the process in KB
+'''
+def residentMemory():
+  try:
+    with open("/proc/self/statm") as statm: # Linux, current value
+      return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+  except (IOError, OSError):
+    import resource # peak value elsewhere (KB on Linux, bytes on macOS)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+'''
+Loads ~count~ selectors in the render mode ~mode~ and prints: load ms, first paint ms, memory KB
+'''
+def run(mode, count):
+  import maya.standalone
+  maya.standalone.initialize()
+  from PySide.QtGui import QApplication, QWidget
+  import widgets
+
+  app = QApplication.instance() or QApplication(sys.argv)
+  side = int(count ** 0.5) + 1
+  parent = QWidget()
+  parent.resize(side * SPACING + SPACING, side * SPACING + SPACING)
+  data = [{
+    "cid": i,
+    "pos_x": i % side * SPACING,
+    "pos_y": i // side * SPACING,
+    "target_objs": ["bench{}".format(i)],
+    "color": COLORS[i % len(COLORS)],
+    "radius": 8 + i % 3
+  } for i in range(count)]
+  app.processEvents()
+
+  memory = residentMemory()
+  start = time.time()
+  canvas = widgets.SelectorCanvas(parent) if mode == widgets.RenderMode.canvas else None
+  selectors = [widgets.Selector.load(parent, item, client=True, canvas=canvas) for item in data]
+  load = (time.time() - start) * 1000
+
+  start = time.time()
+  parent.show()
+  parent.repaint() # paints the selectors synchronously
+  app.processEvents()
+  paint = (time.time() - start) * 1000
+
+  print("{} {} {}".format(load, paint, residentMemory() - memory))
+  return selectors
+
+def main(counts):
+  print("{:>9} {:>8} {:>10} {:>12} {:>10}".format("selectors", "mode", "load", "first paint", "memory"))
+  for count in counts:
+    for name, mode in MODES:
+      output = subprocess.check_output([sys.executable, os.path.abspath(__file__), "--run", str(mode), str(count)])
+      load, paint, memory = output.decode("utf-8").split()[-3:] # Maya may print its own messages first
+      print("{:>9} {:>8} {:>8.1f}ms {:>10.1f}ms {:>8}KB".format(count, name, float(load), float(paint), memory))
+
+if __name__ == "__main__":
+  if sys.argv[1:2] == ["--run"]:
+    run(int(sys.argv[2]), int(sys.argv[3]))
+  else:
+    main([int(arg) for arg in sys.argv[1:]] or [100, 1000, 5000])
@@ -0,0 +1,103 @@
+'''
+Measures the latency of the update scheduler slices against the whole-tab refresh they replace
+A viewer tab (CUILayoutWidget) of sliders is refreshed with the mouse resting in its middle, every
+hot attribute lookup is recomputed as if the mouse kept moving. Every slice (hot attribute lookup
+included) must stay within the budget plus the cost of one attribute
+Run from the repository root with the Python of Maya: mayapy benchmarks/update_budget.py [controls...]
+Qt needs a display, on a headless Linux machine run it under xvfb-run
+'''
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # the modules import each other by name
+
+import maya.standalone
+maya.standalone.initialize()
+
+import maya.cmds as mc
+from PySide.QtGui import QApplication, QCursor
+
+import cuiViewer
+import updates
+
+BUDGET = 4 # ms, the scheduler default
+SPACING = 20 # px between the sliders
+
+'''
+Creates ~count~ transforms and a tab of sliders driving their translateX
+'''
+def makeTab(count, scheduler):
+  mc.file(new=True, force=True)
+  side = int(count ** 0.5) + 1
+  tab = cuiViewer.CUILayoutWidget(updates.UpdateMode.timer, scheduler=scheduler)
+  tab.resize(side * SPACING + 100, side * SPACING + 100)
+  tab.show()
+  for i in range(count):
+    node = mc.createNode("transform", name="bench{}".format(i))
+    mc.setAttr(node + ".translateX", i % 100)
+    tab.loadControl("slider", {
+      "cid": i,
+      "pos_x": i % side * SPACING,
+      "pos_y": i // side * SPACING,
+      "target_attr": node + ".translateX",
+      "min_attr_val": 0.0,
+      "max_attr_val": 100.0,
+      "length": SPACING - 2,
+      "is_vertical": False
+    })
+  QCursor.setPos(tab.mapToGlobal(tab.rect().center())) # the mouse rests in the middle of the tab
+  return tab
+
+'''
+Makes every call of the shipped tab.hotAttributes recompute the lookup and records its duration (ms)
+'''
+def timeHotAttributes(tab):
+  lookups = []
+  hotAttributes = tab.hotAttributes
+  def timed(*args):
+    tab.hotSpots = None # as if the mouse had moved
+    start = time.time()
+    hot = hotAttributes(*args)
+    lookups.append((time.time() - start) * 1000)
+    return hot
+  tab.hotAttributes = timed
+  return lookups
+
+def main(counts):
+  app = QApplication.instance() or QApplication(sys.argv)
+  print("{:>8} {:>12} {:>8} {:>12} {:>12} {:>12}".format(
+    "controls", "full refresh", "slices", "worst slice", "mean slice", "hot lookup"))
+  for count in counts:
+    scheduler = updates.UpdateScheduler(updates.LocalNotifier(), budget=BUDGET)
+    tab = makeTab(count, scheduler)
+    app.processEvents()
+    scheduler.stop() # driven by hand below
+    for controls in tab.engine.watchers.values():
+      for control in controls:
+        control.invalidate()
+
+    start = time.time()
+    tab.engine.tick() # everything at once, as before the scheduler
+    full = (time.time() - start) * 1000
+
+    for controls in tab.engine.watchers.values():
+      for control in controls:
+        control.invalidate() # displayed nothing yet
+    lookups = timeHotAttributes(tab)
+    scheduler.register(tab)
+    scheduler.tick() # queues the refresh and processes the first slice
+    slices = [scheduler.lastSlice]
+    while scheduler.pending:
+      scheduler.process()
+      slices.append(scheduler.lastSlice)
+
+    print("{:>8} {:>10.1f}ms {:>8} {:>10.2f}ms {:>10.2f}ms {:>10.3f}ms".format(
+      count, full, len(slices), max(slices), sum(slices) / len(slices), max(lookups)))
+    assert all(control.cachedValue is not None for controls in tab.engine.watchers.values() for control in controls), \
+      "not every control was updated"
+    tab.close()
+
+if __name__ == "__main__":
+  main([int(arg) for arg in sys.argv[1:]] or [100, 1000, 5000])
@@ -4,18 +4,22 @@ import ui
 import widgets
 import setupDialogs 
 import utils
+import layout
+import journal
 
 if DEBUG:
   reload(ui)
   reload(widgets)
   reload(setupDialogs)
   reload(utils)
+  reload(layout)
+  reload(journal)
 
 from setupDialogs import *
 from PySide.QtCore import *
 from PySide.QtGui import *
-import json
 import shutil
+import functools
 
 
 class State: # enum for widget placing states
@@ -25,6 +29,9 @@ class State: # enum for widget placing states
 
 
 class CUIBuilder(QDialog):
+  saved = Signal(str) # file name, emitted once the layout is safely in the file
+  saveFailed = Signal(str, str) # file name, error message
+
   def __init__(self):
     parent = ui.maya_main_window()
     super(CUIBuilder, self).__init__(parent)
@@ -40,6 +47,12 @@ class CUIBuilder(QDialog):
     self.focusedControl = None
     self.characterName = None
     self.background = None
+    self.fileName = None # layout file being edited
+    self.journal = None # edits since the last save (see journal.py)
+    self.changes = 0 # number of edits made in the session
+    self.saveThread = None # writes the layout in the background (see layout.SaveThread)
+    self.saveMark = 0 # number of journal edits included in the layout being saved
+    self.savedChanges = 0 # number of edits included in the layout being saved
 
     self.reset()
     self.toolbar = ui.CUIToolBar(self)
@@ -48,6 +61,8 @@ class CUIBuilder(QDialog):
     self.toolbar.load.clicked.connect(self.load)
     self.toolbar.background.clicked.connect(self.setBackground)
 
+    self.openJournal() # recover the unsaved work on a new layout
+
   def showEvent(self, event):
     self.toolbar.show()
 
@@ -77,6 +92,7 @@ class CUIBuilder(QDialog):
         if isinstance(self.focusedControl, widgets.Slider):
           self.focusedControl.is_vertical = not self.focusedControl.is_vertical
           self.focusedControl.updateGeometry()
+          self.recordSetup(self.focusedControl)
 
     elif self.toolbar.checkbox.isChecked(): # if checkbox tool is active
       self.newCheckbox(position) # create a new checkbox
@@ -121,6 +137,9 @@ class CUIBuilder(QDialog):
   def mouseReleaseEvent(self, event):
     if self.placingState != State.idle:
       self.modified = True # do not let the user exit without saving
+      if self.focusedControl is not None and self.focusedControl.cid in self.controls:
+        pos = self.focusedControl.pos
+        self.record("move", cid=self.focusedControl.cid, x=pos.x(), y=pos.y())
     self.placingState = State.idle # clear the state
 
   '''
@@ -137,25 +156,10 @@ class CUIBuilder(QDialog):
   '''
   def duplicateControl(self, control, newPos):
     copy = control.serialize()
-    controlType = copy.keys()[0]
-
-    if controlType == "selector":
-      newWidget = self.newSelector(newPos)
-
-    elif controlType == "command_button":
-      newWidget = self.newCommandButton(newPos)
-
-    elif controlType == "checkbox":
-      newWidget = self.newCheckbox(newPos)
-
-    elif controlType == "slider":
-      newWidget = self.newSlider(newPos)
-
-    elif controlType == "float_field":
-      newWidget = self.newFloatField(newPos)
-
-    newWidget.deserialize(copy[controlType], duplicate=True)
+    newWidget = self.newControl(type(control), newPos)
+    newWidget.deserialize(copy[control.TYPE], duplicate=True)
     newWidget.setup()
+    self.recordSetup(newWidget)
     return newWidget
 
   def onWidgetTriggered(self):
@@ -185,6 +189,7 @@ class CUIBuilder(QDialog):
     elif self.toolbar.remove.isChecked(): # remove tool active => destroy the control
       self.controls[widget.cid].clean_up()
       del self.controls[widget.cid]
+      self.record("remove", cid=widget.cid)
     
   '''
   Get next unique control id
@@ -194,104 +199,45 @@ class CUIBuilder(QDialog):
     return self.currentCid
 
   '''
-  Create new selector
+  Create new control of ~controlClass~ (see widgets.registerControl)
   '''
-  def newSelector(self, pos=None, cid=None):
+  def newControl(self, controlClass, pos=None, cid=None):
     if pos is None:
       pos = QPoint(0, 0)
 
     if cid is None:
       cid = self.nextCid()
 
-    newSelector = widgets.Selector(p=self, pos=pos, cid=cid)
-    self.controls[cid] = newSelector
-    newSelector.clicked.connect(self.onWidgetTriggered)
+    newControl = controlClass(p=self, pos=pos, cid=cid)
+    self.addControl(newControl)
+    self.record("add", type=newControl.TYPE, data=newControl.serialize()[newControl.TYPE])
 
-    self.focusedControl = newSelector
+    self.focusedControl = newControl
     self.moveOrigin = pos
     self.placingState = State.placing_new
-    return newSelector
+    return newControl
 
-  '''
-  Create new command button
-  '''
-  def newCommandButton(self, pos=None, cid=None):
-    if pos is None:
-      pos = QPoint(0, 0)
-    
-    if cid is None:
-      cid = self.nextCid()
+  def newSelector(self, pos=None, cid=None):
+    return self.newControl(widgets.Selector, pos, cid)
 
-    newCommandButton = widgets.CommandButton(p=self, pos=pos, cid=cid)
-    self.controls[cid] = newCommandButton
-    newCommandButton.clicked.connect(self.onWidgetTriggered)
-      
-    self.focusedControl = newCommandButton
-    self.moveOrigin = pos
-    self.placingState = State.placing_new
-    return newCommandButton
+  def newCommandButton(self, pos=None, cid=None):
+    return self.newControl(widgets.CommandButton, pos, cid)
 
-  '''
-  Create new slider
-  '''
   def newSlider(self, pos=None, cid=None):
-    if pos is None:
-      pos = QPoint(0, 0)
+    return self.newControl(widgets.Slider, pos, cid)
 
-    if cid is None:
-      cid = self.nextCid()
-
-    newSlider = widgets.Slider(p=self, pos=pos, cid=cid)
-    self.controls[cid] = newSlider
-    newSlider.released.connect(self.onWidgetTriggered)
-
-    self.focusedControl = newSlider
-    self.moveOrigin = pos
-    self.placingState = State.placing_new
-    return newSlider
-
-  '''
-  Create new checkbox
-  '''
   def newCheckbox(self, pos=None, cid=None):
-    if pos is None:
-      pos = QPoint(0, 0)
+    return self.newControl(widgets.CheckBox, pos, cid)
 
-    if cid is None:
-      cid = self.nextCid()
-
-    newCheckBox = widgets.CheckBox(p=self, pos=pos, cid=cid)
-    self.controls[cid] = newCheckBox
-    newCheckBox.stateChanged.connect(self.onWidgetTriggered)
-
-    self.focusedControl = newCheckBox
-    self.moveOrigin = pos
-    self.placingState = State.placing_new
-    return newCheckBox
-
-  '''
-  Create new float field
-  '''
   def newFloatField(self, pos=None, cid=None):
-    if pos is None:
-      pos = QPoint(0, 0)
-
-    if cid is None:
-      cid = self.nextCid()
-
-    newFloatField = widgets.FloatField(p=self, pos=pos, cid=cid)
-    self.controls[cid] = newFloatField
-    newFloatField.focused.connect(self.onWidgetTriggered)
-
-    self.focusedControl = newFloatField
-    self.moveOrigin = pos
-    self.placingState = State.placing_new
-    return newFloatField
+    return self.newControl(widgets.FloatField, pos, cid)
 
   '''
   Save the current layout to file
   '''
   def save(self):
+    self.waitForSave() # one save at a time
+
     if self.characterName is None:
       # ask for character name (appears as tab title in CUI Viewer)
       userInput = QInputDialog.getText(self, "Character Name", "Character Name")
@@ -309,6 +255,7 @@ class CUIBuilder(QDialog):
     else:
       return # about if no file selected
 
+    # snapshot of the layout (nothing shared with the controls), encoded and written by the save thread
     serialized = {
       "name": self.characterName,
       "window_width": self.width(),
@@ -318,18 +265,134 @@ class CUIBuilder(QDialog):
       "controls": [x.serialize() for x in self.controls.values()] # serialize all controls
     }
 
-    with open(fileName, "w") as outputFile:
-      json.dump(serialized, outputFile) # write the JSON data into specified file
+    self.saveMark = self.journal.count if self.journal is not None else 0
+    self.savedChanges = self.changes
+    self.saveThread = layout.SaveThread(fileName, serialized, parent=self)
+    self.saveThread.finished.connect(functools.partial(self.onSaveFinished, self.saveThread))
+    self.saveThread.start()
+
+  '''
+  Called when the save ~thread~ is done
+  On success compacts the journal and clears the modification state unless edited meanwhile
+  '''
+  def onSaveFinished(self, thread):
+    if thread is None or thread is not self.saveThread: # already handled (see waitForSave)
+      return
+
+    self.saveThread = None
+    thread.wait() # make sure run() has returned
+    thread.deleteLater()
+    fileName = thread.fileName
+
+    if not thread.ok: # the old file is intact and the edits stay in the journal
+      error = thread.error or "the save was interrupted"
+      pm.warning("Could not save {}: {}".format(fileName, error))
+      self.saveFailed.emit(fileName, error)
+      return
 
-    self.modified = False # clear the modification state
+    layout.invalidate(fileName) # the cached layout is outdated
 
+    # the saved edits are in the file now => start a new journal with the edits made during the save
+    remaining = []
+    if self.journal is not None:
+      remaining = self.journal.records()[1 + self.saveMark:] # skip the base line and the saved edits
+      self.journal.discard()
+    self.fileName = fileName
+    self.journal = journal.Journal(journal.journalPath(fileName), fileName)
+    self.journal.discard() # a journal left at the target path (saved as another layout) belongs to the old file
+    for record in remaining:
+      self.journal.write(record)
+
+    self.modified = self.changes != self.savedChanges # clear the modification state
+    self.saved.emit(fileName)
+
+  '''
+  Block until the save in progress (if any) is finished
+  '''
+  def waitForSave(self):
+    if self.saveThread is not None:
+      self.saveThread.wait()
+      self.onSaveFinished(self.saveThread)
+
+  '''
+  Register the control and let it be picked by the tools
+  '''
   def addControl(self, control):
     self.controls[control.cid] = control
+    getattr(control, control.TRIGGER).connect(self.onWidgetTriggered)
+    control.configured.connect(self.onControlConfigured)
+
+  '''
+  Settings changed by a setup dialog
+  '''
+  def onControlConfigured(self):
+    self.recordSetup(self.sender())
+
+  '''
+  Append the edit ~op~ to the journal
+  '''
+  def record(self, op, **data):
+    self.changes += 1
+    if self.journal is None:
+      return
+
+    try:
+      self.journal.append(op, **data)
+    except (IOError, OSError) as e:
+      pm.warning("Could not write the journal {}: {}. Unsaved changes will not be recovered".format(self.journal.path, e))
+      self.journal = None
+
+  def recordSetup(self, control):
+    self.record("setup", cid=control.cid, data=control.serialize()[control.TYPE])
+
+  '''
+  Start the journal of ~fileName~ as loaded in the state ~stamp~ (or of a new layout) and replay the edits left unsaved by the last session
+  '''
+  def openJournal(self, fileName=None, stamp=None):
+    if self.journal is not None:
+      self.journal.close()
+
+    path = journal.journalPath(fileName if fileName is not None else utils.charactersDir() + "untitled.cui")
+    self.journal = journal.Journal(path, fileName, stamp)
+    records = self.journal.read()
+    if records:
+      self.replay(records)
+      self.modified = True # not saved yet
+      pm.warning("Recovered {} unsaved changes from {}".format(len(records), path))
+
+  '''
+  Apply the journal ~records~ to the layout
+  '''
+  def replay(self, records):
+    for record in records:
+      op = record["op"]
+      if op == "add":
+        controlClass = widgets.controlClass(record["type"])
+        if controlClass is not None:
+          control = controlClass.load(self, record["data"])
+          self.addControl(control)
+          self.currentCid = max(self.currentCid, control.cid)
+
+      elif op == "background":
+        self.background = record["background"]
+        self.updateBackground()
+
+      elif record.get("cid") in self.controls:
+        control = self.controls[record["cid"]]
+        if op == "move":
+          control.move(QPoint(record["x"], record["y"]))
+        elif op == "setup":
+          control.deserialize(record["data"], duplicate=True) # keep the cid and position
+          control.setup()
+        elif op == "remove":
+          control.clean_up()
+          del self.controls[control.cid]
 
   '''
   Load the layout from file
   '''
   def load(self):
+    self.waitForSave()
     if not self.failSafe(): # trying to exit without saving
       return
 
@@ -340,10 +403,12 @@ class CUIBuilder(QDialog):
     else:
       return # abort if not file specified
 
+    if self.journal is not None: # the unsaved changes are dropped
+      self.journal.discard()
     self.reset()
 
-    with open(fileName, "r") as inputFile:
-      jsonData = json.load(inputFile) # parse JSON data
+    stamp = journal.fileStamp(fileName) # taken before reading, a change meanwhile makes the journal stale rather than misapplied
+    jsonData = layout.load(fileName) # parse the layout (JSON or binary) unless cached
 
     self.resize(jsonData["window_width"], jsonData["window_height"])
     self.currentCid = jsonData["last_cid"]
@@ -353,31 +418,12 @@ class CUIBuilder(QDialog):
 
     for ctrl in jsonData["controls"]: # load the controls
       controlType = ctrl.keys()[0]
-      control = ctrl[controlType]
-
-      if controlType == "selector":
-        widget = widgets.Selector(self)
-        widget.clicked.connect(self.onWidgetTriggered)
-
-      elif controlType == "slider":
-        widget = widgets.Slider(self)
-        widget.valueChanged.connect(self.onWidgetTriggered)
-        
-      elif controlType == "command_button":
-        widget = widgets.CommandButton(self)
-        widget.clicked.connect(self.onWidgetTriggered)
-
-      elif controlType == "checkbox":
-        widget = widgets.CheckBox(self)
-        widget.stateChanged.connect(self.onWidgetTriggered)
-
-      elif controlType == "float_field":
-        widget = widgets.FloatField(self)
-        widget.focused.connect(self.onWidgetTriggered)
+      controlClass = widgets.controlClass(controlType) # see widgets.registerControl
+      if controlClass is not None:
+        self.addControl(controlClass.load(self, ctrl[controlType]))
 
-      widget.deserialize(control)
-      widget.setup(client=False)
-      self.addControl(widget)
+    self.fileName = fileName
+    self.openJournal(fileName, stamp) # recover the unsaved work on this layout
 
   '''
   Without this stylesheets will not work (Qt peculiarity)
@@ -406,9 +452,12 @@ class CUIBuilder(QDialog):
       return True
 
   def closeEvent(self, event):
+    self.waitForSave()
     if not self.failSafe():
       event.ignore() # abort if exit without changes not confirmed
     else:
+      if self.journal is not None: # the unsaved changes are dropped
+        self.journal.discard()
       event.accept() # otherwise exit
 
   '''
@@ -440,6 +489,8 @@ class CUIBuilder(QDialog):
 
     self.background = fileName # set the BG filename
     self.updateBackground() # redraw the BG
+    self.modified = True
+    self.record("background", background=fileName)
 
   def reset(self):
     self.resize(512, 512)
@@ -2,11 +2,17 @@ from . import DEBUG
 
 import widgets
 import utils
+import updates
+import indexes
+import layout
 import ui
 
 if DEBUG:
   reload(widgets)
   reload(utils)
+  reload(updates)
+  reload(indexes)
+  reload(layout)
   reload(ui)
 
 from ui import maya_main_window 
@@ -15,20 +21,37 @@ from PySide.QtCore import *
 from maya import mel
 import pymel.core as pm
 import maya.cmds as mc
-import json
+import collections
+import time
 
 '''
 Implements a CUI Viewer tab
 '''
 class CUILayoutWidget(QWidget):
-  def __init__(self):
+  def __init__(self, updateMode=updates.UpdateMode.event, scheduler=None, policy=None, renderMode=widgets.RenderMode.widgets):
     super(CUILayoutWidget, self).__init__()
     self.controls = {}
     self.w = 0
     self.h = 0
     self.characterName = ""
-    self.timer = self.startTimer(500) # set timer for control updates (every .5 sec)
+    self.updateMode = updateMode
+    self.engine = updates.UpdateEngine() # feeds the attribute values to the controls
+    self.policy = policy or updates.UpdatePolicy() # adaptive polling interval (timer mode only)
+    self.scheduler = scheduler or updates.scheduler() # process-wide owner of the update work
+    self.hotSpots = None # mouse and focus positions hotAttributes() was computed for
+    self.hot = [] # attributes of the controls near the hot spots
+    self.selectionIndex = indexes.SelectionIndex() # scene object => selectors referencing it
+    self.selectorGrid = indexes.SpatialGrid() # selector positions for drag selection
+    self.syncedGrid = indexes.SpatialGrid() # centers of the controls mirroring attributes (see hotAttributes)
+    self.tagIndex = indexes.TagIndex() # tag => ids of the controls tagged by it
+    self.selectionEvents = 0 # number of processed selection changes
+    self.lastRedraws = 0 # selectors redrawn during the last selection change
+    self.totalRedraws = 0 # selectors redrawn during all the selection changes
     self.setFocusPolicy(Qt.StrongFocus) # receive focus from both keyboard and mouse
+    self.renderMode = renderMode
+    self.canvas = None # paints all the selectors in the canvas rendering mode
+    if renderMode == widgets.RenderMode.canvas:
+      self.canvas = widgets.SelectorCanvas(self) # created first to stay below the other controls
     self.symbols = { # the vision scope for compiling the custom commands
       "pm": pm, # pymel.core as pm
       "mc": mc, # maya.cmds as mc
@@ -37,8 +60,13 @@ class CUILayoutWidget(QWidget):
     self.selectionRect = None # rubber band for drag selection
     self.dragging = False # drag selection state
     self.dragOrigin = None # the start position of drag selection
+    self.previewed = set() # selectors inside the rubber band during drag selection
+    self.loader = None # creates the controls of the layout (see LayoutLoader)
+    # bursts of selection changes (marquee selection, scripts etc.) are processed once the event loop is idle
+    self.selectionChanged = utils.Debouncer(self.updateSelection)
     # Maya script job to update the states of selectors
-    self.selectionChangedSJ = pm.scriptJob(event=["SelectionChanged", self.updateSelection])
+    self.selectionChangedSJ = pm.scriptJob(event=["SelectionChanged", self.selectionChanged.trigger])
+    self.scheduler.register(self) # start updating the controls
 
   '''
   Without this stylesheets will not work (Qt peculiarity)
@@ -50,42 +78,109 @@ class CUILayoutWidget(QWidget):
     self.style().drawPrimitive(QStyle.PE_Widget, opt, p, self)
 
   '''
-  Called when the timer expires, updates the controls states
+  Keep the selector canvas covering the whole tab
   '''
-  def timerEvent(self, event):
-    if not (self.hasFocus() or self.childHasFocus()): # if not focused
-      self.updateControls() # update the controls
+  def resizeEvent(self, event):
+    if self.canvas is not None:
+      self.canvas.resize(event.size())
+
+  '''
+  Replace the adaptive interval policy of the tab
+  '''
+  def setUpdatePolicy(self, policy):
+    self.policy = policy
+    self.scheduler.boost(self)
+
+  '''
+  The user is about to interact with the tab
+  '''
+  def enterEvent(self, event):
+    self.scheduler.boost(self)
+
+  '''
+  Hidden tabs are not updated, so catch up when shown
+  '''
+  def showEvent(self, event):
+    self.scheduler.refresh(self)
 
   '''
   Cleaning up before closing
   '''
   def closeEvent(self, event):
-    self.killTimer(self.timer) # kill the update timer
+    if self.loader is not None:
+      self.loader.cancel() # stop creating the controls
+    self.scheduler.unregister(self) # stop updating the controls
     pm.scriptJob(kill=self.selectionChangedSJ) # kill the script job
+    self.selectionChanged.cancel() # drop the pending selection update
     event.accept() # go ahead with the event
 
+  '''
+  Returns True if neither the tab nor its controls have focus
+  '''
+  def isIdle(self):
+    return not (self.hasFocus() or self.childHasFocus())
+
+  '''
+  Returns the attributes of the controls under the mouse or near the focused widget (within ~radius~ px)
+  '''
+  def hotAttributes(self, radius=100):
+    spots = []
+    cursor = self.mapFromGlobal(QCursor.pos())
+    if self.rect().contains(cursor): # mouse is over the tab
+      spots.append(cursor)
+    focused = QApplication.focusWidget()
+    if focused is not None and self.isAncestorOf(focused):
+      spots.append(focused.mapTo(self, focused.rect().center())) # may be nested (e.g. the line edit of a spin box)
+
+    key = [(spot.x(), spot.y()) for spot in spots]
+    if key == self.hotSpots: # nothing moved since the last call
+      return self.hot
+
+    self.hotSpots = key
+    hot = set()
+    for spot in spots: # only the controls in the grid cells around the spots are looked at
+      for control in self.syncedGrid.queryRect(spot.x() - radius, spot.y() - radius, spot.x() + radius, spot.y() + radius):
+        x, y = self.syncedGrid.bounds[control][:2]
+        if abs(x - spot.x()) + abs(y - spot.y()) <= radius: # manhattan distance
+          hot.add(control.syncedAttr())
+    self.hot = list(hot)
+    return self.hot
+
+  '''
+  Keep the center of the synced ~control~ in the grid up to date
+  '''
+  def indexSynced(self, control):
+    if control.syncedAttr() is None: # not updated anymore
+      self.syncedGrid.remove(control)
+    else:
+      center = control.widget.geometry().center()
+      self.syncedGrid.insert(control, center.x(), center.y())
+    self.hotSpots = None # recompute the hot attributes
+
   '''
   Returns True if some of the controls has focus
   Otherwise returns False
   '''
   def childHasFocus(self):
-    for control in self.controls.values():
-      if control.widget.hasFocus():
-        return True
-    return False
+    focused = QApplication.focusWidget()
+    return focused is not None and self.isAncestorOf(focused)
 
   '''
   Called when the Maya selection is updated
   '''
   def updateSelection(self):
     selection = set(map(str, pm.ls(sl=1))) # the selected objects and convert to set for convenience
-    for control in self.controls.values(): # iterate over all controls
-      if isinstance(control, widgets.Selector): # if the control is a selector
-        if set(control.target_objs) <= selection: # if its target objects are selected
-          control.is_selected = True # set selected
-        else:
-          control.is_selected = False # otherwise set not selected
+    redraws = 0
+    for control in self.selectionIndex.select(selection): # only the selectors whose targets entered or left the selection
+      isSelected = self.selectionIndex.isSelected(control) # selected if all its target objects are selected
+      if isSelected != control.is_selected: # redraw only if the highlighting flips
+        control.is_selected = isSelected
         control.redraw() # redraw to update the appearance (selected controls are circled)
+        redraws += 1
+
+    self.selectionEvents += 1
+    self.lastRedraws = redraws
+    self.totalRedraws += redraws
 
   '''
   Returns all the active selectors
@@ -99,17 +194,116 @@ class CUILayoutWidget(QWidget):
 
   '''
   Used for drag selection
+  Computes the result of activating all the ~selectors~ and applies it with a single selection command
   '''
   def activateSelectorsAsGroup(self, selectors):
+    groups = []
     if not QApplication.keyboardModifiers() == Qt.ShiftModifier: # if shift is not pressed
-      for selector in self.activeSelectors():
-        selector.action(drag=True) # deselect all active selectors
+      groups.extend(selector.target_objs for selector in self.activeSelectors()) # deselect all active selectors
+    groups.extend(selector.target_objs for selector in selectors) # activate the given selectors
 
-    for selector in selectors:
-      selector.action(drag=1) # activate the given selectors
+    selection = map(str, pm.ls(sl=1))
+    newSelection = utils.toggleGroups(selection, groups)
+    if newSelection != selection: # do not fire SelectionChanged for nothing
+      utils.selectObjects(newSelection)
 
   def addControl(self, control):
     self.controls[control.cid] = control
+    self.tagIndex.add(control.cid, control.tags)
+    control.configured.connect(self.onControlConfigured)
+
+    if isinstance(control, widgets.Selector):
+      self.selectionIndex.add(control)
+      self.syncSelectionState(control) # the targets may be selected already
+      self.selectorGrid.insert(control, control.pos.x(), control.pos.y())
+      control.targetsChanged.connect(self.onTargetsChanged)
+      control.moved.connect(self.onSelectorMoved)
+
+    if control.syncedAttr() is None: # nothing to update
+      return
+
+    isNew = self.engine.add(control)
+    self.indexSynced(control)
+    control.moved.connect(self.onSyncedMoved)
+    if isNew and self.updateMode == updates.UpdateMode.event: # watch every attribute only once per tab
+      # Note: changes caused by animation playback are not reported by Maya, the scheduler refreshes the tab on timeChanged
+      self.scheduler.watch(control.syncedAttr())
+    self.scheduler.refresh(self) # display the current value
+
+  '''
+  Remove the control with specified cid from the tab and destroy it
+  '''
+  def removeControl(self, cid):
+    control = self.controls.pop(cid)
+    self.tagIndex.remove(cid)
+
+    if isinstance(control, widgets.Selector):
+      self.selectionIndex.remove(control)
+      self.selectorGrid.remove(control)
+      self.previewed.discard(control)
+
+    self.syncedGrid.remove(control)
+    attr = control.syncedAttr()
+    if self.engine.remove(control) and self.updateMode == updates.UpdateMode.event:
+      self.scheduler.unwatch(attr) # no other control of the tab mirrors the attribute
+    self.hotSpots = None # recompute the hot attributes
+    control.clean_up()
+
+  '''
+  Keep the tag index up to date
+  '''
+  def onControlConfigured(self):
+    control = self.sender()
+    self.tagIndex.update(control.cid, control.tags)
+    if control in self.syncedGrid: # the size may have changed
+      self.indexSynced(control)
+
+  '''
+  Keep the selector grid up to date
+  '''
+  def onSelectorMoved(self):
+    selector = self.sender()
+    if selector in self.selectorGrid:
+      self.selectorGrid.move(selector, selector.pos.x(), selector.pos.y())
+
+  '''
+  Keep the grid of the synced controls up to date
+  '''
+  def onSyncedMoved(self):
+    control = self.sender()
+    if control in self.syncedGrid:
+      self.indexSynced(control)
+
+  '''
+  Called when the target objects of a selector are reconfigured
+  '''
+  def onTargetsChanged(self):
+    selector = self.sender()
+    self.selectionIndex.update(selector)
+    self.syncSelectionState(selector)
+
+  '''
+  Highlight ~selector~ if its targets are selected (according to the selection index)
+  '''
+  def syncSelectionState(self, selector):
+    isSelected = self.selectionIndex.isSelected(selector)
+    if isSelected != selector.is_selected:
+      selector.is_selected = isSelected
+      selector.redraw()
+
+  '''
+  Creates the control of ~controlType~ from its serialized ~data~ and adds it to the tab
+  ~colors~ is the resolver of the selector override colors (see utils.OverrideColorResolver)
+  Returns the control or None if the type is unknown
+  '''
+  def loadControl(self, controlType, data, colors=None):
+    controlClass = widgets.controlClass(controlType) # see widgets.registerControl
+    if controlClass is None:
+      return None
+
+    control = controlClass.load(self, data, client=True, canvas=self.canvas, colors=colors)
+    self.addControl(control)
+    return control
 
   def updateBackground(self):
     if self.background is None: # abort if has not BG
@@ -121,68 +315,78 @@ class CUILayoutWidget(QWidget):
 
   '''
   Update the controls to match the current attribute states
+  Returns the number of unique attributes read
   '''
   def updateControls(self):
-    for control in self.controls.values():
-      control.updateControl()
+    self.engine.tick()
+    return self.engine.lastReads
+
+  '''
+  Show (~state~ is True) or hide the ~controls~
+  If ~obj~ is True shows/hides the assigned objects as well (for selectors) with a single undoable command
+  Returns the summary of the scene changes (see utils.setVisibility) if ~obj~ is True
+  '''
+  def setControlsVisibility(self, controls, state, obj=False):
+    targets = [] # target objects of all the affected selectors
+    for control in controls:
+      if state:
+        control.show()
+      else:
+        control.hide()
+
+      if obj and isinstance(control, widgets.Selector):
+        targets.extend(control.target_objs)
+
+    if obj:
+      return utils.setVisibility(targets, state)
 
   '''
   Show the control with specified cid
   If ~obj~ is True shows the assigned objects as well (for selectors)
   '''
   def showByCid(self, cid, obj=False):
-    self.controls[cid].show()
-    
-    if obj and isinstance(self.controls[cid], widgets.Selector):
-      for obj in self.controls[cid].target_objs:
-        pm.setAttr("{}.visibility".format(obj), True)
+    return self.setControlsVisibility([self.controls[cid]], True, obj)
 
   '''
   Hide the control with specified cid
   If ~obj~ is True hides the assigned objects as well (for selectors)
   '''
   def hideByCid(self, cid, obj=False):
-    self.controls[cid].hide()
-
-    if obj and isinstance(self.controls[cid], widgets.Selector):
-      for obj in self.controls[cid].target_objs:
-        pm.setAttr("{}.visibility".format(obj), False)
+    return self.setControlsVisibility([self.controls[cid]], False, obj)
 
   '''
   Show all objects tagged by ~tag~
   If ~obj~ is True shows the assigned objects as well (for selectors)
   '''
   def showByTag(self, tag, obj=False):
-    for control in self.controls.values():
-      if tag in control.tags:
-        control.show()
-        
-        if obj and isinstance(control, widgets.Selector):
-          for obj in control.target_objs:
-            pm.setAttr("{}.visibility".format(obj), True)
+    return self.setControlsVisibility([self.controls[cid] for cid in self.tagIndex.lookup(tag)], True, obj)
 
   '''
   Hide all objects tagged by ~tag~
   If ~obj~ is True hides the assigned objects as well (for selectors)
   '''
   def hideByTag(self, tag, obj=False):
-    for control in self.controls.values():
-        if tag in control.tags:
-          control.hide()
-
-          if obj and isinstance(control, widgets.Selector):
-            for obj in control.target_objs:
-              pm.setAttr("{}.visibility".format(obj), False)
+    return self.setControlsVisibility([self.controls[cid] for cid in self.tagIndex.lookup(tag)], False, obj)
 
   '''
   Activate all the selectors tagged by ~tag~
+  ~mode~ defines how their targets are applied to the current selection (see utils.SelectionMode)
   '''
-  def selectByTag(self, tag):
-    pm.select([])
+  def selectByTag(self, tag, mode=utils.SelectionMode.replace):
+    targets = [] # union of the target objects, selected with a single command
+    for cid in sorted(self.tagIndex.lookup(tag)):
+      control = self.controls[cid]
+      if isinstance(control, widgets.Selector):
+        targets.extend(control.target_objs)
 
-    for control in self.controls.values():
-      if isinstance(control, widgets.Selector) and tag in control.tags:
-        pm.select(control.target_objs, add=1)
+    utils.selectObjects(targets, mode)
+
+  '''
+  Returns the controls matching the tag ~expression~, e.g. "face & left & !secondary"
+  ("&" - and, "|" - or, "!" - not, parentheses for grouping)
+  '''
+  def controlsByTags(self, expression):
+    return [self.controls[cid] for cid in sorted(self.tagIndex.query(expression))]
 
   '''
   Init drag selection
@@ -200,6 +404,21 @@ class CUILayoutWidget(QWidget):
     if self.selectionRect: # if not dragging a control
       geo = QRect(*utils.calculateCorners(self.dragOrigin, event.pos())) # calculate the rectangle corners
       self.selectionRect.setGeometry(geo) # set the rectangle position and size
+      # highlight the selectors which are going to be affected
+      self.previewSelectors(self.selectorGrid.queryRect(geo.left(), geo.top(), geo.right(), geo.bottom()))
+
+  '''
+  Highlight ~selectors~ (set) as affected by the drag selection
+  Only the selectors entering or leaving the set are redrawn
+  '''
+  def previewSelectors(self, selectors):
+    for selector in self.previewed - selectors: # left the rubber band
+      selector.is_previewed = False
+      selector.redraw()
+    for selector in selectors - self.previewed: # entered the rubber band
+      selector.is_previewed = True
+      selector.redraw()
+    self.previewed = selectors
 
   '''
   Finalize drag selection
@@ -207,11 +426,11 @@ class CUILayoutWidget(QWidget):
   def mouseReleaseEvent(self, event):
     if self.selectionRect: # if not dragging a control
       area = QRect(*utils.calculateCorners(self.dragOrigin, event.pos())) # calculate the affected area
+      self.previewSelectors(set()) # drop the preview highlighting
 
-      controls_in_area = [] # container for all affected selectors
-      for control in self.controls.values():
-        if isinstance(control, widgets.Selector) and area.contains(control.pos):
-          controls_in_area.append(control) # if control is a selector and located inside the affected area
+      # all the selectors located inside the affected area
+      controls_in_area = sorted(self.selectorGrid.queryRect(area.left(), area.top(), area.right(), area.bottom()),
+        key=lambda control: control.cid)
 
       # clear the selection if clicked or dragged on blank space without shift pressed
       if not controls_in_area and not QApplication.keyboardModifiers() == Qt.ShiftModifier:
@@ -222,12 +441,107 @@ class CUILayoutWidget(QWidget):
       self.selectionRect = None
       event.accept() # go ahead with the event
 
+'''
+Creates the controls of a layout in slices across the event loop turns, so the tab
+with its background is shown (and stays responsive) while a large layout is loading
+The controls inside the visible area of the tab are created first, each slice stops after ~budget~ ms
+'''
+class LayoutLoader(QObject):
+  progress = Signal(int, int) # number of controls created, total number of controls
+  finished = Signal()
+
+  def __init__(self, tab, controls, colors=None, budget=10):
+    super(LayoutLoader, self).__init__(tab)
+    self.tab = tab
+    self.colors = colors # override color resolver for the selectors
+    self.budget = budget # time (ms) a single slice may take
+    self.pending = collections.deque(self.order(controls)) # (is visible, control type, data)
+    self.total = len(self.pending)
+    self.created = 0
+    self.cancelled = False
+    # timings (ms since start)
+    self.started = None
+    self.firstPaintTime = None # the tab is painted for the first time
+    self.visibleTime = None # all the controls of the visible area are created
+    self.loadTime = None # all the controls are created
+    self.timer = QTimer(self)
+    self.timer.setInterval(0) # next slice as soon as the pending events are processed
+    self.timer.timeout.connect(self.step)
+
+  def now(self):
+    return time.time() * 1000
+
+  '''
+  Returns the ~controls~ (serialized) with the ones inside the visible area of the tab first
+  The file order is kept otherwise, so the overlapping controls stack up the same way
+  '''
+  def order(self, controls):
+    visibleArea = QRect(0, 0, self.tab.w, self.tab.h)
+    ordered = []
+    for ctrl in controls:
+      controlType = ctrl.keys()[0]
+      data = ctrl[controlType]
+      visible = visibleArea.contains(data.get("pos_x", 0), data.get("pos_y", 0))
+      ordered.append((visible, controlType, data))
+    ordered.sort(key=lambda item: not item[0]) # stable sort
+    return ordered
+
+  '''
+  Starts creating the controls
+  '''
+  def start(self):
+    self.started = self.now()
+    self.tab.installEventFilter(self) # catch the first paint
+    self.timer.start()
+
+  '''
+  Stops creating the controls (the tab is closed)
+  '''
+  def cancel(self):
+    self.cancelled = True
+    self.pending.clear()
+    self.timer.stop()
+    self.tab.removeEventFilter(self)
+
+  def isFinished(self):
+    return self.loadTime is not None
+
+  def eventFilter(self, obj, event):
+    if event.type() == QEvent.Paint and self.firstPaintTime is None:
+      self.firstPaintTime = self.now() - self.started
+      self.tab.removeEventFilter(self)
+    return False # let the tab paint itself
+
+  '''
+  Creates the next slice of the controls
+  '''
+  def step(self):
+    start = self.now()
+    while self.pending:
+      visible, controlType, data = self.pending.popleft()
+      self.tab.loadControl(controlType, data, self.colors)
+      self.created += 1
+
+      if self.visibleTime is None and (not self.pending or not self.pending[0][0]):
+        self.visibleTime = self.now() - self.started
+      if self.now() - start >= self.budget: # out of time, give the event loop a chance
+        break
+
+    self.progress.emit(self.created, self.total)
+    if not self.pending:
+      self.timer.stop()
+      self.loadTime = self.now() - self.started
+      self.finished.emit()
+
+
 '''
 Implements the main window of CUI Viewer
 '''
 class CUIViewer(QDialog):
-  def __init__(self, tab=None):
+  def __init__(self, tab=None, updateMode=updates.UpdateMode.event, renderMode=widgets.RenderMode.widgets):
     super(CUIViewer, self).__init__(maya_main_window())
+    self.updateMode = updateMode # update strategy for the new tabs
+    self.renderMode = renderMode # selector rendering strategy for the new tabs
     self.setWindowFlags(Qt.Window)
     self.setAttribute(Qt.WA_DeleteOnClose)
     self.setWindowTitle("Character UI Viewer")
@@ -284,8 +598,8 @@ class CUIViewer(QDialog):
 
     elif event.key() == Qt.Key_R and event.modifiers() == Qt.ControlModifier:
       # Ctrl+R => close the current tab
-      tab = self.tabWidget.currentIndex()
-      self.tabWidget.removeTab(tab)
+      tab = self.tabWidget.currentWidget()
+      self.tabWidget.removeTab(self.tabWidget.currentIndex())
       tab.close()
       tab.deleteLater()
 
@@ -295,7 +609,7 @@ class CUIViewer(QDialog):
       tab_id = self.tabWidget.currentIndex()
       self.tabWidget.removeTab(tab_id)
       from . import viewer
-      viewer(tab)
+      viewer(tab, timer=self.updateMode == updates.UpdateMode.timer, canvas=self.renderMode == widgets.RenderMode.canvas)
 
     elif event.key() == Qt.Key_Q:
       # Q => switch Maya tool to Selection Tool
@@ -324,10 +638,9 @@ class CUIViewer(QDialog):
     else: # abort if could not get the filename
       return
 
-    with open(fileName, "r") as inputFile:
-      jsonData = json.load(inputFile) # parse the file
+    jsonData = layout.load(fileName) # parse the file (JSON or binary) unless cached
 
-    tab = CUILayoutWidget() # create a new tab instance
+    tab = CUILayoutWidget(self.updateMode, renderMode=self.renderMode) # create a new tab instance
 
     # load settings from file
     tab.w = jsonData["window_width"]
@@ -336,39 +649,40 @@ class CUIViewer(QDialog):
     tab.updateBackground() # redraw the BG
     tab.characterName = jsonData["name"]
 
-    for ctrl in jsonData["controls"]: # load the control from file
-      controlType = ctrl.keys()[0]
-      control = ctrl[controlType]
-
-      if controlType == "selector":
-        selector = widgets.Selector(tab)
-        selector.deserialize(control)
-        selector.setup(client=True)
-        tab.addControl(selector)
-
-      elif controlType == "slider":
-        slider = widgets.Slider(tab)
-        slider.deserialize(control)
-        slider.setup(client=True)
-        tab.addControl(slider)
-        
-      elif controlType == "command_button":
-        cmdButton = widgets.CommandButton(tab)
-        cmdButton.deserialize(control)
-        cmdButton.setup(client=True)
-        tab.addControl(cmdButton)
-
-      elif controlType == "checkbox":
-        checkBox = widgets.CheckBox(tab)
-        checkBox.deserialize(control)
-        checkBox.setup(client=True)
-        tab.addControl(checkBox)
-
-      elif controlType == "float_field":
-        floatField = widgets.FloatField(tab)
-        floatField.deserialize(control)
-        floatField.setup(client=True)
-        tab.addControl(floatField)
-
-    self.tabWidget.addTab(tab, tab.characterName) # add the tab
-    tab.updateSelection() # set up the selectors states
\ No newline at end of file
+    # resolve the override colors of all the selectors in one pass over the hierarchy
+    colors = utils.OverrideColorResolver()
+    colors.resolve([ctrl["selector"]["target_objs"][0] for ctrl in jsonData["controls"] # missing fields get the defaults
+      if "selector" in ctrl and ctrl["selector"].get("override_color") and ctrl["selector"].get("target_objs")])
+
+    self.tabWidget.addTab(tab, tab.characterName) # show the tab with its background right away
+    tab.updateSelection() # the selectors pick up their states when created
+
+    # create the controls progressively
+    tab.loader = LayoutLoader(tab, jsonData["controls"], colors)
+    tab.loader.progress.connect(self.onLoadProgress)
+    tab.loader.finished.connect(self.onLoadFinished)
+    tab.loader.start()
+
+  '''
+  Show the loading progress in the tab title
+  '''
+  def onLoadProgress(self, created, total):
+    tab = self.sender().tab
+    tabId = self.tabWidget.indexOf(tab)
+    if tabId != -1 and total: # the tab may be torn off
+      self.tabWidget.setTabText(tabId, "{} ({}%)".format(tab.characterName, 100 * created // total))
+
+  '''
+  Restore the tab title, the load timings are reported in the debug mode only (see LayoutLoader for the values)
+  '''
+  def onLoadFinished(self):
+    loader = self.sender()
+    tabId = self.tabWidget.indexOf(loader.tab)
+    if tabId != -1:
+      self.tabWidget.setTabText(tabId, loader.tab.characterName)
+
+    if not DEBUG:
+      return
+    firstPaint = "{:.0f} ms".format(loader.firstPaintTime) if loader.firstPaintTime is not None else "not painted"
+    pm.displayInfo("CUI {}: {} controls loaded in {:.0f} ms (first paint: {}, visible area: {:.0f} ms)".format(
+      loader.tab.characterName, loader.total, loader.loadTime, firstPaint, loader.visibleTime or 0))
@@ -0,0 +1,296 @@
+'''
+Lookup structures keeping the viewer operations independent of the layout size
+Nothing in here depends on Maya or Qt
+'''
+
+'''
+Inverted index from scene object names to the selectors referencing them
+Keeps the number of selected target objects for every selector, so a selection
+change only touches the selectors whose targets entered or left the selection
+'''
+class SelectionIndex(object):
+  def __init__(self):
+    self.selectors = {} # object name => selectors referencing it
+    self.targets = {} # selector => set of its target objects
+    self.counts = {} # selector => number of its target objects currently selected
+    self.selection = set() # currently selected objects
+
+  '''
+  Starts tracking ~selector~
+  '''
+  def add(self, selector):
+    targets = set(selector.target_objs)
+    self.targets[selector] = targets
+    self.counts[selector] = len(targets & self.selection)
+    for obj in targets:
+      self.selectors.setdefault(obj, set()).add(selector)
+
+  '''
+  Stops tracking ~selector~
+  '''
+  def remove(self, selector):
+    targets = self.targets.pop(selector, set())
+    self.counts.pop(selector, None)
+    for obj in targets:
+      selectors = self.selectors[obj]
+      selectors.discard(selector)
+      if not selectors:
+        del self.selectors[obj]
+
+  '''
+  Reindexes ~selector~ after its target objects have changed
+  '''
+  def update(self, selector):
+    self.remove(selector)
+    self.add(selector)
+
+  '''
+  Returns True if all the target objects of ~selector~ are selected (selectors without targets never are)
+  '''
+  def isSelected(self, selector):
+    targets = self.targets[selector]
+    return bool(targets) and self.counts[selector] == len(targets)
+
+  '''
+  Replaces the current selection with ~selection~ (set of object names)
+  Returns the selectors whose targets entered or left the selection
+  '''
+  def select(self, selection):
+    added = selection - self.selection
+    removed = self.selection - selection
+    self.selection = selection
+
+    touched = set()
+    for obj in added:
+      for selector in self.selectors.get(obj, ()):
+        self.counts[selector] += 1
+        touched.add(selector)
+    for obj in removed:
+      for selector in self.selectors.get(obj, ()):
+        self.counts[selector] -= 1
+        touched.add(selector)
+    return touched
+
+
+'''
+Uniform grid of rectangles for answering rectangle and point queries
+without looking at every item. Coordinates are inclusive (as in QRect)
+'''
+class SpatialGrid(object):
+  def __init__(self, cellSize=64):
+    self.cellSize = cellSize # size (px) of the grid cells
+    self.cells = {} # (column, row) => set of items overlapping the cell
+    self.bounds = {} # item => (left, top, right, bottom)
+
+  def __len__(self):
+    return len(self.bounds)
+
+  def __contains__(self, item):
+    return item in self.bounds
+
+  '''
+  Returns the cells overlapped by the given rectangle
+  '''
+  def cellsIn(self, left, top, right, bottom):
+    size = self.cellSize
+    for column in range(int(left) // size, int(right) // size + 1):
+      for row in range(int(top) // size, int(bottom) // size + 1):
+        yield (column, row)
+
+  '''
+  Starts tracking ~item~ covering the given rectangle (a point if right/bottom are omitted)
+  '''
+  def insert(self, item, left, top, right=None, bottom=None):
+    if item in self.bounds:
+      self.remove(item)
+
+    bounds = (left, top, left if right is None else right, top if bottom is None else bottom)
+    self.bounds[item] = bounds
+    for cell in self.cellsIn(*bounds):
+      self.cells.setdefault(cell, set()).add(item)
+
+  '''
+  Stops tracking ~item~
+  '''
+  def remove(self, item):
+    bounds = self.bounds.pop(item, None)
+    if bounds is None:
+      return
+
+    for cell in self.cellsIn(*bounds):
+      items = self.cells[cell]
+      items.discard(item)
+      if not items:
+        del self.cells[cell]
+
+  '''
+  Updates the rectangle covered by ~item~
+  '''
+  def move(self, item, left, top, right=None, bottom=None):
+    self.insert(item, left, top, right, bottom)
+
+  '''
+  Returns the items intersecting the given rectangle
+  '''
+  def queryRect(self, left, top, right, bottom):
+    found = set()
+    if right < left or bottom < top: # empty rectangle
+      return found
+
+    for cell in self.cellsIn(left, top, right, bottom):
+      for item in self.cells.get(cell, ()):
+        if item in found:
+          continue
+        itemLeft, itemTop, itemRight, itemBottom = self.bounds[item]
+        if itemLeft <= right and itemRight >= left and itemTop <= bottom and itemBottom >= top:
+          found.add(item)
+    return found
+
+  '''
+  Returns the items containing the point
+  '''
+  def queryPoint(self, x, y):
+    return self.queryRect(x, y, x, y)
+
+
+'''
+Index from tags to the ids of the controls tagged by them
+Answers tag expressions like "face & left & !secondary" ("&" - and, "|" - or, "!" - not, parentheses
+for grouping) with set operations, the results are cached until the index changes
+'''
+class TagIndex(object):
+  OPERATORS = "&|!()"
+
+  def __init__(self):
+    self.controls = {} # tag => set of control ids
+    self.tags = {} # control id => its tags
+    self.version = 0 # incremented on every change
+    self.compiled = {} # expression => compiled evaluator
+    self.results = {} # expression => (version, control ids)
+
+  '''
+  Starts tracking the control with ~cid~ tagged by ~tags~
+  '''
+  def add(self, cid, tags):
+    if cid in self.tags:
+      self.remove(cid)
+
+    self.tags[cid] = set(tags)
+    for tag in self.tags[cid]:
+      self.controls.setdefault(tag, set()).add(cid)
+    self.version += 1
+
+  '''
+  Stops tracking the control with ~cid~
+  '''
+  def remove(self, cid):
+    for tag in self.tags.pop(cid, ()):
+      cids = self.controls[tag]
+      cids.discard(cid)
+      if not cids:
+        del self.controls[tag]
+    self.version += 1
+
+  '''
+  Updates the tags of the control with ~cid~
+  '''
+  def update(self, cid, tags):
+    if self.tags.get(cid) != set(tags):
+      self.add(cid, tags)
+
+  '''
+  Returns the ids of the controls tagged by ~tag~
+  '''
+  def lookup(self, tag):
+    return self.controls.get(tag, set())
+
+  '''
+  Returns the ids of the controls matching the tag ~expression~
+  Raises ValueError if the expression is malformed
+  '''
+  def query(self, expression):
+    cached = self.results.get(expression)
+    if cached is not None and cached[0] == self.version:
+      return cached[1]
+
+    evaluator = self.compiled.get(expression)
+    if evaluator is None:
+      evaluator = self.compiled[expression] = self.compile(expression)
+
+    cids = frozenset(evaluator(self))
+    self.results[expression] = (self.version, cids)
+    return cids
+
+  '''
+  Splits ~expression~ into tags and operators
+  '''
+  def tokenize(self, expression):
+    tokens = []
+    tag = ""
+    for char in expression:
+      if char in self.OPERATORS or char.isspace():
+        if tag:
+          tokens.append(tag)
+          tag = ""
+        if not char.isspace():
+          tokens.append(char)
+      else:
+        tag += char
+    if tag:
+      tokens.append(tag)
+    return tokens
+
+  '''
+  Compiles ~expression~ into a function of the index returning a set of control ids
+  Recursive descent: expression = term {"|" term}, term = factor {"&" factor}, factor = "!" factor | "(" expression ")" | tag
+  '''
+  def compile(self, expression):
+    tokens = self.tokenize(expression)
+    position = [0] # current token
+
+    def peek():
+      return tokens[position[0]] if position[0] < len(tokens) else None
+
+    def take():
+      token = peek()
+      if token is None:
+        raise ValueError("Unexpected end of tag expression: {}".format(expression))
+      position[0] += 1
+      return token
+
+    def parseExpression():
+      terms = [parseTerm()]
+      while peek() == "|":
+        take()
+        terms.append(parseTerm())
+      if len(terms) == 1:
+        return terms[0]
+      return lambda index: set().union(*[term(index) for term in terms])
+
+    def parseTerm():
+      factors = [parseFactor()]
+      while peek() == "&":
+        take()
+        factors.append(parseFactor())
+      if len(factors) == 1:
+        return factors[0]
+      return lambda index: set.intersection(*[set(factor(index)) for factor in factors])
+
+    def parseFactor():
+      token = take()
+      if token == "!":
+        factor = parseFactor()
+        return lambda index: set(index.tags) - factor(index)
+      if token == "(":
+        inner = parseExpression()
+        if take() != ")":
+          raise ValueError("Missing closing parenthesis in tag expression: {}".format(expression))
+        return inner
+      if token in self.OPERATORS:
+        raise ValueError("Unexpected '{}' in tag expression: {}".format(token, expression))
+      return lambda index: index.lookup(token)
+
+    evaluator = parseExpression()
+    if peek() is not None:
+      raise ValueError("Unexpected '{}' in tag expression: {}".format(peek(), expression))
+    return evaluator
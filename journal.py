@@ -0,0 +1,120 @@
+'''
+Append-only journal of the CUI Builder edits made since the layout was last saved
+Every edit is a JSON line appended (and flushed) as it happens, so the cost of recording
+an edit does not depend on the size of the layout, and the unsaved work survives a crash
+
+The first line ("base") holds the modification time and size of the layout file the edits
+apply to (taken when the layout was loaded), the journal is ignored if the file has been changed since. The other lines are
+  {"op": "add", "type": control type, "data": serialized control}
+  {"op": "move", "cid": control id, "x": x, "y": y}
+  {"op": "setup", "cid": control id, "data": serialized control}
+  {"op": "remove", "cid": control id}
+  {"op": "background", "background": background image}
+'''
+
+import json
+import os
+
+'''
+Returns the journal path of the layout file ~fileName~
+'''
+def journalPath(fileName):
+  return fileName + ".journal"
+
+'''
+Returns the stamp (modification time and size) of the layout file ~fileName~ or None if there is no such file
+'''
+def fileStamp(fileName):
+  if fileName is None or not os.path.exists(fileName):
+    return None
+  stat = os.stat(fileName)
+  return [stat.st_mtime, stat.st_size]
+
+
+'''
+The edits of the layout file ~target~ in the state given by ~stamp~ (see fileStamp, the current state by default)
+'''
+class Journal(object):
+  def __init__(self, path, target=None, stamp=None):
+    self.path = path # journal file
+    self.target = target # layout file the edits apply to (None if not saved yet)
+    self.base = stamp if stamp is not None else fileStamp(target) # state of the file the edits were made against
+    self.file = None # opened on the first edit
+    self.count = 0 # number of edits in the journal
+
+  '''
+  Appends the edit ~op~ described by ~data~
+  '''
+  def append(self, op, **data):
+    data["op"] = op
+    self.write(data)
+
+  '''
+  Appends the edit ~record~ (see the module description)
+  '''
+  def write(self, record):
+    if self.file is None:
+      isNew = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+      self.file = open(self.path, "a")
+      if isNew:
+        self.file.write(json.dumps({"op": "base", "stamp": self.base}) + "\n")
+
+    self.file.write(json.dumps(record) + "\n")
+    self.file.flush() # hand it over to the OS right away
+    self.count += 1
+
+  '''
+  Returns the recorded edits (without the base line)
+  A torn last line (crash while writing) ends the journal, a journal of another state of the layout file is discarded
+  '''
+  def read(self):
+    records = self.records()
+    if not records or records[0].get("op") != "base" or records[0].get("stamp") != self.base: # stale
+      self.discard()
+      return []
+
+    self.count = len(records) - 1
+    return records[1:]
+
+  '''
+  Returns all the lines of the journal (including the base line) regardless of the layout file state
+  '''
+  def records(self):
+    if self.file is not None:
+      self.file.flush()
+    if not os.path.exists(self.path):
+      return []
+
+    with open(self.path, "rb") as inputFile:
+      data = inputFile.read()
+
+    records = []
+    valid = 0 # size of the readable part
+    for line in data.splitlines(True):
+      try:
+        records.append(json.loads(line.decode("utf-8")))
+      except ValueError: # torn write
+        break
+      if not line.endswith(b"\n"): # not finished
+        records.pop()
+        break
+      valid += len(line)
+
+    if valid < len(data): # cut the torn write off, so the next edits are not appended after it
+      with open(self.path, "r+b") as outputFile:
+        outputFile.truncate(valid)
+    return records
+
+  def close(self):
+    if self.file is not None:
+      self.file.close()
+      self.file = None
+
+  '''
+  Closes and deletes the journal (the edits are saved or dropped)
+  '''
+  def discard(self):
+    self.close()
+    self.count = 0
+    if os.path.exists(self.path):
+      os.remove(self.path)
@@ -0,0 +1,424 @@
+'''
+Reading and writing the CUI layout files
+A layout is stored either as JSON or in the compact binary format below, both are loaded into the same
+structure: {"name", "window_width", "window_height", "background_image", "last_cid", "controls": [{type: fields}]}
+
+Binary format (little-endian):
+  header        "CUIB", format version (uint16)
+  string table  number of strings (uint32), size of the zlib-compressed blob (uint32), blob of
+                (length (uint32), UTF-8 bytes) pairs; every string (scripts, tags, object names...) is stored once
+  layout        name, background_image (string refs), window_width, window_height, last_cid (int32), number of controls (uint32)
+  controls      type code (uint8) followed by the fixed-layout record of the type: cid, pos_x, pos_y
+                and the non-list FIELDS of the control class in the declared order (see widgets.registerControl)
+                string list fields follow the record as a number of strings (uint16) and the string refs
+
+A string ref is the uint32 index in the string table, NO_STRING stands for None
+
+The parsed layouts are cached (see load), so opening the same character again does not touch the file
+'''
+
+import json
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import zlib
+import utils
+import widgets
+from PySide.QtCore import QThread
+
+UMASK = os.umask(0) # the umask can only be read by setting it, so it is done once on import (in the main thread)
+os.umask(UMASK)
+
+MAGIC = b"CUIB"
+VERSION = 1
+NO_STRING = 0xFFFFFFFF
+
+'''
+Field kinds of the binary records: (struct format, default value)
+'''
+FIELD_KINDS = {
+  "int": ("i", 0),
+  "float": ("d", 0.0),
+  "bool": ("?", False),
+  "string": ("I", ""),
+  "strings": (None, ()) # variable length, stored after the fixed part of the record
+}
+
+HEADER = struct.Struct("<4sH")
+COUNT = struct.Struct("<I")
+STRING_LIST_COUNT = struct.Struct("<H")
+LAYOUT = struct.Struct("<IIiiiI")
+CONTROL_TYPE = struct.Struct("<B")
+
+
+'''
+Compiled binary layout of the records of the control class ~controlClass~
+'''
+class RecordType(object):
+  def __init__(self, controlClass):
+    self.code = controlClass.CODE
+    self.name = controlClass.TYPE
+    fields = [("cid", "int", -1), ("pos_x", "int", 0), ("pos_y", "int", 0)]
+    fields += [(field.key, field.kind, field.default) for field in controlClass.FIELDS]
+    self.fields = [field for field in fields if field[1] != "strings"] # stored in the fixed part
+    self.lists = [field for field in fields if field[1] == "strings"] # stored after the fixed part
+    self.record = struct.Struct("<" + "".join(FIELD_KINDS[kind][0] for _, kind, _ in self.fields))
+    self.keys = [key for key, _, _ in self.fields]
+    self.stringKeys = [key for key, kind, _ in self.fields if kind == "string"] # stored as string refs
+    self.ints = [i for i, (_, kind, _) in enumerate(self.fields) if kind == "int"] # values coerced on write
+
+RECORD_TYPES = {} # control class => its RecordType
+
+'''
+Returns the record type of the control type ~name~ or None if not registered
+'''
+def recordType(name):
+  controlClass = widgets.controlClass(name)
+  if controlClass is None:
+    return None
+
+  record = RECORD_TYPES.get(controlClass)
+  if record is None:
+    record = RECORD_TYPES[controlClass] = RecordType(controlClass)
+  return record
+
+'''
+Returns the record type of the binary type ~code~ or None if not registered
+'''
+def recordTypeByCode(code):
+  for controlClass in widgets.CONTROL_TYPES.values():
+    if controlClass.CODE == code:
+      return recordType(controlClass.TYPE)
+  return None
+
+
+'''
+Collects the strings of a layout being written, every distinct string gets a single entry
+'''
+class StringTable(object):
+  def __init__(self):
+    self.strings = []
+    self.indexes = {} # string => index in the table
+
+  '''
+  Returns the string ref of ~string~ adding it to the table if needed
+  '''
+  def ref(self, string):
+    if string is None:
+      return NO_STRING
+
+    if isinstance(string, bytes):
+      string = string.decode("utf-8")
+    index = self.indexes.get(string)
+    if index is None:
+      index = self.indexes[string] = len(self.strings)
+      self.strings.append(string)
+    return index
+
+  '''
+  Returns the compressed table
+  '''
+  def pack(self):
+    chunks = []
+    for string in self.strings:
+      encoded = string.encode("utf-8")
+      chunks.append(COUNT.pack(len(encoded)))
+      chunks.append(encoded)
+    blob = zlib.compress(b"".join(chunks))
+    return COUNT.pack(len(self.strings)) + COUNT.pack(len(blob)) + blob
+
+
+'''
+Returns True if ~data~ (the beginning of a file) is a binary layout
+'''
+def isBinary(data):
+  return data[:len(MAGIC)] == MAGIC
+
+'''
+Encodes the ~layout~ structure in the binary format
+'''
+def toBinary(layout):
+  strings = StringTable()
+  chunks = []
+
+  chunks.append(LAYOUT.pack(
+    strings.ref(layout["name"]),
+    strings.ref(layout.get("background_image")),
+    layout["window_width"],
+    layout["window_height"],
+    layout.get("last_cid", 0),
+    len(layout["controls"])))
+
+  for ctrl in layout["controls"]:
+    controlType = list(ctrl.keys())[0]
+    control = ctrl[controlType]
+    record = recordType(controlType)
+    if record is None:
+      raise ValueError("Unknown control type: {}".format(controlType))
+
+    values = []
+    for key, kind, default in record.fields:
+      value = control.get(key, default)
+      values.append(strings.ref(value) if kind == "string" else value)
+    for i in record.ints: # the layouts saved before may hold floats in the integer fields
+      values[i] = int(round(values[i]))
+
+    chunks.append(CONTROL_TYPE.pack(record.code))
+    chunks.append(record.record.pack(*values))
+    for key, _, default in record.lists:
+      items = control.get(key, default)
+      chunks.append(STRING_LIST_COUNT.pack(len(items)))
+      chunks.append(struct.pack("<{}I".format(len(items)), *[strings.ref(item) for item in items]))
+
+  return HEADER.pack(MAGIC, VERSION) + strings.pack() + b"".join(chunks)
+
+'''
+Decodes the binary layout ~data~ into the layout structure
+Raises ValueError if the data is not a valid binary layout
+'''
+def fromBinary(data):
+  try:
+    magic, version = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+      raise ValueError("Not a binary CUI layout")
+    if version > VERSION:
+      raise ValueError("Unsupported binary CUI layout version: {}".format(version))
+    offset = HEADER.size
+
+    # string table
+    count, = COUNT.unpack_from(data, offset)
+    size, = COUNT.unpack_from(data, offset + COUNT.size)
+    offset += 2 * COUNT.size
+    blob = zlib.decompress(data[offset:offset + size])
+    offset += size
+
+    strings = []
+    position = 0
+    for _ in range(count):
+      length, = COUNT.unpack_from(blob, position)
+      position += COUNT.size
+      strings.append(blob[position:position + length].decode("utf-8"))
+      position += length
+
+    def string(ref):
+      return None if ref == NO_STRING else strings[ref]
+
+    lists = {} # length => compiled struct of a string list
+    records = {} # type code => record type
+
+    # layout settings
+    name, background, width, height, lastCid, controlCount = LAYOUT.unpack_from(data, offset)
+    offset += LAYOUT.size
+    layout = {
+      "name": string(name),
+      "background_image": string(background),
+      "window_width": width,
+      "window_height": height,
+      "last_cid": lastCid,
+      "controls": []
+    }
+
+    # control records
+    for _ in range(controlCount):
+      code, = CONTROL_TYPE.unpack_from(data, offset)
+      offset += CONTROL_TYPE.size
+      record = records.get(code)
+      if record is None:
+        record = records[code] = recordTypeByCode(code)
+        if record is None:
+          raise ValueError("Unknown control type code: {}".format(code))
+
+      control = dict(zip(record.keys, record.record.unpack_from(data, offset)))
+      offset += record.record.size
+      for key in record.stringKeys:
+        control[key] = string(control[key])
+
+      for key, _, _ in record.lists:
+        length, = STRING_LIST_COUNT.unpack_from(data, offset)
+        offset += STRING_LIST_COUNT.size
+        refs = lists.get(length)
+        if refs is None:
+          refs = lists[length] = struct.Struct("<{}I".format(length))
+        control[key] = [strings[ref] for ref in refs.unpack_from(data, offset)]
+        offset += refs.size
+
+      layout["controls"].append({record.name: control})
+  except (struct.error, zlib.error, IndexError, UnicodeDecodeError) as e:
+    raise ValueError("Corrupted binary CUI layout: {}".format(e))
+
+  return layout
+
+'''
+Checks that ~layout~ has the settings and only known control types
+Raises ValueError otherwise
+'''
+def validate(layout):
+  for key in ("name", "window_width", "window_height", "controls"):
+    if key not in layout:
+      raise ValueError("The layout has no {}".format(key))
+
+  layout.setdefault("background_image", None)
+  layout.setdefault("last_cid", 0)
+  for ctrl in layout["controls"]:
+    if len(ctrl) != 1 or widgets.controlClass(list(ctrl.keys())[0]) is None:
+      raise ValueError("Unknown control in the layout: {}".format(list(ctrl.keys())))
+  return layout
+
+'''
+Reads and validates the layout from ~fileName~ (JSON or binary, detected by the contents)
+'''
+def read(fileName):
+  with open(fileName, "rb") as inputFile:
+    data = inputFile.read()
+
+  if isBinary(data):
+    return validate(fromBinary(data))
+  return validate(json.loads(data.decode("utf-8")))
+
+
+'''
+In-process cache of the parsed layouts keyed by the file path
+An entry is valid while the modification time and size of the file stay the same,
+the least recently used layouts are dropped when more than ~size~ are cached
+The cached layouts are shared, so they must not be modified (the controls copy what they keep)
+'''
+class LayoutCache(object):
+  def __init__(self, size=8):
+    self.layouts = utils.LRUCache(size) # path => (file stamp, layout)
+
+  def key(self, fileName):
+    return os.path.normcase(os.path.abspath(fileName))
+
+  def stamp(self, fileName):
+    stat = os.stat(fileName)
+    return (stat.st_mtime, stat.st_size)
+
+  '''
+  Returns the layout stored in ~fileName~, parsing the file only if it is not cached or has changed
+  '''
+  def load(self, fileName):
+    key = self.key(fileName)
+    stamp = self.stamp(fileName)
+    cached = self.layouts.get(key)
+    if cached is not None and cached[0] == stamp:
+      return cached[1]
+
+    layout = read(fileName)
+    self.layouts.put(key, (stamp, layout))
+    return layout
+
+  '''
+  Drops the cached layout of ~fileName~ (all the layouts if None)
+  '''
+  def invalidate(self, fileName=None):
+    if fileName is None:
+      self.layouts.clear()
+    else:
+      self.layouts.discard(self.key(fileName))
+
+CACHE = LayoutCache()
+
+'''
+Returns the layout stored in ~fileName~ using the cache
+'''
+def load(fileName):
+  return CACHE.load(fileName)
+
+'''
+Drops the cached layout of ~fileName~ (all the layouts if None)
+'''
+def invalidate(fileName=None):
+  CACHE.invalidate(fileName)
+
+'''
+Returns the ~layout~ encoded as JSON or, if ~binary~ is True, in the binary format
+'''
+def encode(layout, binary=False):
+  if binary:
+    return toBinary(layout)
+  return json.dumps(layout).encode("utf-8")
+
+'''
+Atomically replaces the file ~target~ with ~source~ (both in the same directory)
+'''
+def replaceFile(source, target):
+  if os.name != "nt":
+    os.rename(source, target) # atomic on POSIX, replaces the existing file
+    return
+
+  import ctypes # os.rename refuses to replace existing files on Windows
+  MOVEFILE_REPLACE_EXISTING = 0x1
+  MOVEFILE_WRITE_THROUGH = 0x8
+  if isinstance(source, bytes):
+    source = source.decode(sys.getfilesystemencoding())
+  if isinstance(target, bytes):
+    target = target.decode(sys.getfilesystemencoding())
+  if not ctypes.windll.kernel32.MoveFileExW(source, target, MOVEFILE_REPLACE_EXISTING | MOVEFILE_WRITE_THROUGH):
+    raise ctypes.WinError()
+
+'''
+Writes the ~layout~ into ~fileName~ (see encode) through a temporary file renamed into place,
+so a failed write never leaves a truncated layout behind
+Does not touch the cache, so it may run outside of the UI thread
+'''
+def writeFile(fileName, layout, binary=False):
+  data = encode(layout, binary)
+
+  directory = os.path.dirname(os.path.abspath(fileName))
+  handle, tempName = tempfile.mkstemp(prefix=os.path.basename(fileName) + ".", suffix=".tmp", dir=directory)
+  try:
+    with os.fdopen(handle, "wb") as outputFile:
+      outputFile.write(data)
+      outputFile.flush()
+      os.fsync(outputFile.fileno()) # on the disk before it replaces the old file
+
+    if os.path.exists(fileName):
+      shutil.copymode(fileName, tempName) # keep the permissions of the old file
+    else:
+      os.chmod(tempName, 0o666 & ~UMASK) # as if created by open()
+    replaceFile(tempName, fileName)
+  except Exception:
+    if os.path.exists(tempName):
+      os.remove(tempName)
+    raise
+
+'''
+Writes the ~layout~ into ~fileName~ as JSON or, if ~binary~ is True, in the binary format
+'''
+def write(fileName, layout, binary=False):
+  writeFile(fileName, layout, binary)
+  invalidate(fileName) # the cached layout is outdated
+
+
+'''
+Writes a layout snapshot (see writeFile) in a worker thread
+The snapshot must not be shared with the UI thread, ~ok~ is set only once the file is written,
+otherwise ~error~ holds the message if there is one
+'''
+class SaveThread(QThread):
+  def __init__(self, fileName, layout, binary=False, parent=None):
+    super(SaveThread, self).__init__(parent)
+    self.fileName = fileName
+    self.layout = layout
+    self.binary = binary
+    self.ok = False
+    self.error = None
+
+  def run(self):
+    try:
+      writeFile(self.fileName, self.layout, self.binary)
+      self.ok = True
+    except Exception as e:
+      try:
+        self.error = str(e) or e.__class__.__name__
+      except Exception: # the message can not be converted (unicode under Python 2)
+        self.error = e.__class__.__name__
+
+
+'''
+Converts the layout file ~source~ into the binary format (or into JSON if ~binary~ is False) saving it as ~target~
+'''
+def convert(source, target, binary=True):
+  write(target, read(source), binary)
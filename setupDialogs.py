@@ -56,6 +56,7 @@ class CommandButtonDialog(QDialog, Ui_commandButtonDialog):
     self.widget.cmd = self.codeEdit.toPlainText()
     self.widget.tags = self.tagsEdit.text().split()
     self.widget.setup()
+    self.widget.configured.emit() # let the owner update its indexes
     self.close()
 
 class SelectorDialog(QDialog, Ui_selectorDialog):
@@ -91,10 +92,11 @@ class SelectorDialog(QDialog, Ui_selectorDialog):
     self.widget.override_color = self.colorCheckbox.isChecked()
     self.widget.color = self.colorEdit.text()
     self.widget.tags = self.tagsEdit.text().split()
-    self.widget.target_objs = self.get_target_objs()
+    self.widget.setTargets(self.get_target_objs())
     self.widget.tooltip = self.tooltipEdit.text()
     self.widget.radius = self.radiusSpin.value()
     self.widget.redraw()
+    self.widget.configured.emit() # let the owner update its indexes
     self.close()
 
   def get_target_objs(self):
@@ -132,6 +134,7 @@ class SliderDialog(QDialog, Ui_sliderDialog):
     self.widget.tooltip = self.tooltipEdit.text()
     self.widget.length = self.lengthSpin.value()
     self.widget.setup()
+    self.widget.configured.emit() # let the owner update its indexes
     self.close()
 
   def loadObj(self):
@@ -186,6 +189,7 @@ class CheckBoxDialog(QDialog, Ui_checkboxDialog):
     self.widget.default_state = self.defaultStateCheckbox.isChecked()
     self.widget.is_dir_ctrl = self.directControlRadio.isChecked()
     self.widget.setup()
+    self.widget.configured.emit() # let the owner update its indexes
     self.close()
 
   def loadObj(self):
@@ -224,4 +228,5 @@ class FloatFieldDialog(QDialog, ui.Ui_floatFieldDialog):
     self.widget.h = self.heightSpin.value()
     self.widget.w = self.widthSpin.value()
     self.widget.setup()
+    self.widget.configured.emit() # let the owner update its indexes
     self.close()
\ No newline at end of file
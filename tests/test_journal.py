@@ -0,0 +1,76 @@
+'''
+Tests of the builder edit journal
+Run from the repository root: python -m unittest discover tests
+'''
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # the modules import each other by name
+
+import journal
+
+
+class JournalTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.target = os.path.join(self.directory, "layout.cui")
+    self.writeLayout("{}")
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def writeLayout(self, data):
+    with open(self.target, "w") as outputFile:
+      outputFile.write(data)
+
+  def journal(self, stamp=None):
+    return journal.Journal(journal.journalPath(self.target), self.target, stamp)
+
+  def testReplay(self):
+    edits = self.journal()
+    edits.append("move", cid=1, x=2, y=3)
+    edits.append("remove", cid=1)
+    edits.close()
+
+    records = self.journal().read()
+    self.assertEqual([record["op"] for record in records], ["move", "remove"])
+
+  def testChangedLayoutMakesJournalStale(self):
+    edits = self.journal()
+    edits.append("remove", cid=1)
+    edits.close()
+
+    self.writeLayout('{"changed": true}')
+    self.assertEqual(self.journal().read(), [])
+    self.assertFalse(os.path.exists(journal.journalPath(self.target)))
+
+  def testStampIsTakenAtLoad(self):
+    loaded = journal.fileStamp(self.target)
+    self.writeLayout('{"changed": true}') # changed on disk before the first edit
+    edits = self.journal(loaded)
+    edits.append("remove", cid=1)
+    edits.close()
+
+    self.assertEqual(self.journal().records()[0]["stamp"], loaded)
+    self.assertEqual(self.journal().read(), []) # made against the old file
+
+  def testTornLineIsCutOff(self):
+    edits = self.journal()
+    edits.append("remove", cid=1)
+    edits.close()
+    with open(journal.journalPath(self.target), "a") as outputFile:
+      outputFile.write('{"op": "remo') # crash while writing
+
+    edits = self.journal()
+    self.assertEqual(len(edits.read()), 1)
+    edits.append("remove", cid=2)
+    edits.close()
+    self.assertEqual([record["cid"] for record in self.journal().read()], [1, 2])
+
+
+if __name__ == "__main__":
+  unittest.main()
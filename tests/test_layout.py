@@ -0,0 +1,93 @@
+'''
+Round trip tests of the layout formats
+Run from the repository root with the Python of Maya: mayapy -m unittest discover tests
+'''
+
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # the modules import each other by name
+
+import layout
+import widgets
+
+'''
+Sample values of every field kind, different from the defaults so the round trip can not pass by accident
+'''
+SAMPLES = {
+  "int": lambda i: 7 + i,
+  "float": lambda i: 0.25 + i,
+  "bool": lambda i: True,
+  "string": lambda i: u"value {} \u00e9".format(i),
+  "strings": lambda i: [u"tag{}".format(i), u"shared"]
+}
+
+'''
+Returns a layout holding ~count~ controls of every registered type with all the fields set
+'''
+def sampleLayout(count=3):
+  controls = []
+  cid = 0
+  for controlType, controlClass in widgets.CONTROL_TYPES.items():
+    for _ in range(count):
+      control = {"cid": cid, "pos_x": cid * 10, "pos_y": -cid}
+      for i, field in enumerate(controlClass.FIELDS):
+        control[field.key] = SAMPLES[field.kind](cid + i)
+      controls.append({controlType: control})
+      cid += 1
+
+  return {
+    "name": u"Sample",
+    "window_width": 640,
+    "window_height": 480,
+    "background_image": None,
+    "last_cid": cid,
+    "controls": controls
+  }
+
+
+class LayoutRoundTripTest(unittest.TestCase):
+  def testEveryControlTypeIsSampled(self):
+    types = set(list(ctrl.keys())[0] for ctrl in sampleLayout()["controls"])
+    self.assertEqual(types, set(widgets.CONTROL_TYPES.keys()))
+
+  def testBinaryRoundTrip(self):
+    original = sampleLayout()
+    self.assertEqual(layout.fromBinary(layout.toBinary(original)), original)
+
+  def testJsonBinaryJson(self):
+    original = json.loads(layout.encode(sampleLayout()).decode("utf-8"))
+    restored = layout.fromBinary(layout.encode(original, binary=True))
+    self.assertEqual(json.loads(layout.encode(restored).decode("utf-8")), original)
+
+  def testMissingFieldsGetDefaults(self):
+    original = {"name": u"Empty", "window_width": 10, "window_height": 10, "last_cid": 0, "controls": []}
+    for controlType in widgets.CONTROL_TYPES:
+      original["controls"].append({controlType: {"cid": 0, "pos_x": 0, "pos_y": 0}})
+
+    restored = layout.fromBinary(layout.toBinary(original))
+    for ctrl in restored["controls"]:
+      controlType, control = list(ctrl.items())[0]
+      for field in widgets.controlClass(controlType).FIELDS:
+        self.assertEqual(control[field.key], field.default if field.kind != "strings" else list(field.default))
+
+  def testFloatSliderDefaultIsStoredAsPercent(self):
+    original = sampleLayout(1)
+    for ctrl in original["controls"]:
+      if "slider" in ctrl:
+        ctrl["slider"]["default_val"] = 49.6 # saved by an older version
+
+    for ctrl in layout.fromBinary(layout.toBinary(original))["controls"]:
+      if "slider" in ctrl:
+        self.assertEqual(ctrl["slider"]["default_val"], 50)
+
+  def testCorruptedData(self):
+    data = layout.toBinary(sampleLayout())
+    self.assertRaises(ValueError, layout.fromBinary, data[:len(data) // 2])
+    self.assertRaises(ValueError, layout.fromBinary, b"JSON" + data[4:])
+
+
+if __name__ == "__main__":
+  unittest.main()
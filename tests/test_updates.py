@@ -0,0 +1,152 @@
+'''
+Tests of the update scheduler driven by the LocalNotifier stand-in, no scene is needed
+Run from the repository root with the Python of Maya: mayapy -m unittest discover tests
+'''
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # the modules import each other by name
+
+from PySide.QtCore import QCoreApplication
+import updates
+import utils
+
+APP = QCoreApplication.instance() or QCoreApplication(sys.argv) # the scheduler timer needs one
+
+
+class Widget(object):
+  def hasFocus(self):
+    return False
+
+'''
+Control mirroring ~attr~, remembers the values it was given
+'''
+class Control(object):
+  def __init__(self, attr):
+    self.attr = attr
+    self.widget = Widget()
+    self.values = []
+
+  def syncedAttr(self):
+    return self.attr
+
+  def applyValue(self, val):
+    self.values.append(val)
+    return True
+
+'''
+Event mode tab with the controls mirroring ~attrs~ (the part of CUILayoutWidget the scheduler uses)
+'''
+class Tab(object):
+  def __init__(self, scheduler, attrs):
+    self.updateMode = updates.UpdateMode.event
+    self.engine = updates.UpdateEngine()
+    self.policy = updates.UpdatePolicy()
+    self.controls = {}
+    for attr in attrs:
+      control = self.controls[attr] = Control(attr)
+      if self.engine.add(control): # watched once per tab, as in CUILayoutWidget.addControl
+        scheduler.watch(attr)
+
+  def isVisible(self):
+    return True
+
+  def isIdle(self):
+    return True
+
+  def hotAttributes(self):
+    return []
+
+  def updated(self):
+    return dict((attr, control.values) for attr, control in self.controls.items() if control.values)
+
+  def clear(self):
+    for control in self.controls.values():
+      control.values = []
+
+
+class UpdateSchedulerTest(unittest.TestCase):
+  def setUp(self):
+    self.scene = {"a.tx": 1.0, "b.tx": 2.0, "shared.tx": 3.0}
+    self.reads = []
+    self.getAttrs = utils.getAttrs
+    utils.getAttrs = self.readScene # the scene is a dict, every read is recorded
+
+    self.notifier = updates.LocalNotifier()
+    self.scheduler = updates.UpdateScheduler(self.notifier)
+    self.first = Tab(self.scheduler, ["a.tx", "shared.tx"])
+    self.second = Tab(self.scheduler, ["b.tx", "shared.tx"])
+    self.scheduler.register(self.first)
+    self.scheduler.register(self.second)
+    self.processUpdates()
+
+  def tearDown(self):
+    self.scheduler.stop()
+    utils.getAttrs = self.getAttrs
+
+  def readScene(self, attrs):
+    self.reads.extend(attrs)
+    return dict((attr, self.scene[attr]) for attr in attrs if attr in self.scene)
+
+  '''
+  Processes the queued work as the timer would
+  '''
+  def processUpdates(self):
+    self.scheduler.tick()
+    while self.scheduler.pending:
+      self.scheduler.process()
+
+  def change(self, attr, value):
+    self.scene[attr] = value
+    self.notifier.notify(attr) # as the attributeChange script job would
+    self.reads = []
+    self.first.clear()
+    self.second.clear()
+    self.processUpdates()
+
+  def testRegisterRefreshesEverythingOnce(self):
+    self.assertEqual(sorted(self.reads), ["a.tx", "b.tx", "shared.tx"]) # the shared attribute is read once
+    self.assertEqual(self.scheduler.lastTickReads, 3)
+    self.assertEqual(self.first.updated(), {"a.tx": [1.0], "shared.tx": [3.0]})
+    self.assertEqual(self.second.updated(), {"b.tx": [2.0], "shared.tx": [3.0]})
+
+  def testOnlyNotifiedAttributeIsRefreshed(self):
+    self.change("a.tx", 5.0)
+    self.assertEqual(self.reads, ["a.tx"])
+    self.assertEqual(self.first.updated(), {"a.tx": [5.0]})
+    self.assertEqual(self.second.updated(), {})
+
+  def testSharedAttributeIsReadOnce(self):
+    self.change("shared.tx", 7.0)
+    self.assertEqual(self.reads, ["shared.tx"])
+    self.assertEqual(self.scheduler.lastTickReads, 1)
+    self.assertEqual(self.first.updated(), {"shared.tx": [7.0]})
+    self.assertEqual(self.second.updated(), {"shared.tx": [7.0]})
+
+  def testTimeChangeRefreshesEventTabs(self):
+    self.scene["a.tx"] = 9.0 # animated, not reported by the watchers
+    self.reads = []
+    self.scheduler.onTimeChanged()
+    self.processUpdates()
+    self.assertEqual(sorted(self.reads), ["a.tx", "b.tx", "shared.tx"])
+    self.assertEqual(self.first.updated()["a.tx"][-1], 9.0)
+
+  def testUnregisterDropsSubscriptions(self):
+    self.assertEqual(len(self.notifier.callbacks["shared.tx"]), 2)
+    self.scheduler.unregister(self.first)
+    self.assertFalse("a.tx" in self.notifier.callbacks)
+    self.assertEqual(len(self.notifier.callbacks["shared.tx"]), 1) # still watched by the second tab
+
+    self.change("shared.tx", 4.0)
+    self.assertEqual(self.first.updated(), {})
+    self.assertEqual(self.second.updated(), {"shared.tx": [4.0]})
+
+    self.scheduler.unregister(self.second)
+    self.assertEqual(self.notifier.callbacks, {})
+    self.assertTrue(self.scheduler.timeChangedSJ is None) # last tab gone
+
+
+if __name__ == "__main__":
+  unittest.main()
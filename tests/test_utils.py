@@ -0,0 +1,62 @@
+'''
+Tests of the helpers in utils.py
+Run from the repository root with the Python of Maya: mayapy -m unittest discover tests
+'''
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # the modules import each other by name
+
+import utils
+
+
+class DebouncerTest(unittest.TestCase):
+  def setUp(self):
+    self.updates = 0
+    self.deferred = [] # stand-in for the event loop: flushes waiting to run
+    self.debouncer = utils.Debouncer(self.update, defer=self.deferred.append)
+
+  def update(self):
+    self.updates += 1
+
+  def runEventLoop(self):
+    while self.deferred:
+      self.deferred.pop(0)()
+
+  def testBurstCollapsesToOneUpdate(self):
+    for _ in range(50): # e.g. SelectionChanged fired for every object of a marquee selection
+      self.debouncer.trigger()
+    self.assertEqual(self.updates, 0) # nothing happens until the event loop is idle
+    self.assertEqual(len(self.deferred), 1)
+
+    self.runEventLoop()
+    self.assertEqual(self.debouncer.calls, 50)
+    self.assertEqual(self.debouncer.flushes, 1)
+    self.assertEqual(self.updates, 1)
+
+  def testNextBurstIsUpdatedAgain(self):
+    self.debouncer.trigger()
+    self.runEventLoop()
+    self.debouncer.trigger("ignored argument")
+    self.debouncer.trigger()
+    self.runEventLoop()
+    self.assertEqual(self.debouncer.flushes, 2)
+    self.assertEqual(self.updates, 2)
+
+  def testCancel(self):
+    self.debouncer.trigger()
+    self.debouncer.trigger()
+    self.debouncer.cancel() # e.g. the tab is closed before the event loop runs
+    self.runEventLoop()
+    self.assertEqual(self.debouncer.flushes, 0)
+    self.assertEqual(self.updates, 0)
+
+    self.debouncer.trigger() # usable after cancelling
+    self.runEventLoop()
+    self.assertEqual(self.updates, 1)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,543 @@
+import collections
+import functools
+import time
+import pymel.core as pm
+import utils
+from PySide.QtCore import QObject, QTimer
+
+'''
+This module is responsible for keeping the viewer controls
+in sync with the attributes they are driving
+'''
+
+class UpdateMode: # enum for control update strategies
+  timer = 0 # poll all the attributes periodically
+  event = 1 # refresh only the controls whose attributes have changed
+
+
+'''
+Delivers attribute change notifications using Maya script jobs
+Every attribute is watched by a single script job no matter how many callbacks are subscribed to it
+'''
+class AttributeNotifier(object):
+  def __init__(self):
+    self.callbacks = {} # attribute => list of subscribed callbacks
+    self.jobs = {} # attribute => handle of the underlying watcher
+
+  '''
+  Makes ~callback~ be called with the attribute name every time ~attr~ changes
+  Returns False if the attribute could not be watched
+  '''
+  def subscribe(self, attr, callback):
+    if attr not in self.callbacks: # first subscriber => start watching the attribute
+      try:
+        self.jobs[attr] = self.watch(attr)
+      except Exception: # if attribute is not accessible or does not exist
+        return False
+      self.callbacks[attr] = []
+
+    self.callbacks[attr].append(callback)
+    return True
+
+  '''
+  Stops delivering the changes of ~attr~ to ~callback~
+  '''
+  def unsubscribe(self, attr, callback):
+    callbacks = self.callbacks.get(attr)
+    if not callbacks or callback not in callbacks:
+      return
+
+    callbacks.remove(callback)
+    if not callbacks: # last subscriber gone => stop watching the attribute
+      del self.callbacks[attr]
+      self.unwatch(self.jobs.pop(attr))
+
+  '''
+  Drops all the subscriptions
+  '''
+  def clear(self):
+    for job in self.jobs.values():
+      self.unwatch(job)
+    self.callbacks = {}
+    self.jobs = {}
+
+  '''
+  Delivers the change of ~attr~ to all of its subscribers
+  '''
+  def notify(self, attr):
+    for callback in list(self.callbacks.get(attr, [])): # copy, callbacks may unsubscribe
+      callback(attr)
+
+  '''
+  Starts watching ~attr~, returns the watcher handle
+  '''
+  def watch(self, attr):
+    return pm.scriptJob(attributeChange=[attr, functools.partial(self.notify, attr)])
+
+  '''
+  Stops the watcher returned by watch()
+  '''
+  def unwatch(self, job):
+    if pm.scriptJob(exists=job):
+      pm.scriptJob(kill=job)
+
+  '''
+  Makes ~callback~ be called every time the Maya ~event~ happens, returns the watcher handle (see unwatch)
+  '''
+  def watchEvent(self, event, callback):
+    return pm.scriptJob(event=[event, callback])
+
+
+'''
+Stand-in for AttributeNotifier which does not need Maya
+Changes are delivered only by calling notify() by hand (used for testing)
+'''
+class LocalNotifier(AttributeNotifier):
+  def watch(self, attr):
+    return attr
+
+  def unwatch(self, job):
+    pass
+
+  def watchEvent(self, event, callback):
+    return event
+
+
+'''
+Keeps the controls of a tab in sync with the attributes they mirror
+Each tick collects the attributes, reads every one of them only once (however
+many controls are driving it) and fans the values out to the controls
+'''
+class UpdateEngine(object):
+  def __init__(self):
+    self.watchers = {} # attribute => controls mirroring it
+    self.ticks = 0 # number of ticks performed
+    self.lastReads = 0 # unique attributes read during the last tick
+    self.lastControls = 0 # controls actually updated during the last tick
+    self.totalReads = 0 # unique attributes read during all the ticks
+    self.errors = 0 # number of failed control updates
+
+  '''
+  Starts tracking ~control~
+  Returns True if its attribute was not tracked before
+  '''
+  def add(self, control):
+    attr = control.syncedAttr()
+    if attr is None: # control does not mirror anything
+      return False
+
+    isNew = attr not in self.watchers
+    self.watchers.setdefault(attr, []).append(control)
+    return isNew
+
+  '''
+  Stops tracking ~control~
+  Returns True if its attribute is not mirrored by any other control
+  '''
+  def remove(self, control):
+    for attr, controls in self.watchers.items():
+      if control in controls:
+        controls.remove(control)
+        if not controls:
+          del self.watchers[attr]
+          return True
+        return False
+    return False
+
+  '''
+  Returns all the tracked attributes
+  '''
+  def attributes(self):
+    return self.watchers.keys()
+
+  '''
+  Returns the tracked attributes among ~attrs~ (all the tracked attributes by default) without duplicates
+  '''
+  def collect(self, attrs=None):
+    if attrs is None:
+      return self.watchers.keys()
+    return [attr for attr in set(attrs) if attr in self.watchers] # dedupe and drop the unknown ones
+
+  '''
+  Reads ~attrs~ (all the tracked attributes by default) and updates the controls mirroring them
+  '''
+  def tick(self, attrs=None):
+    attrs = self.collect(attrs)
+    values = utils.getAttrs(attrs) # one read per unique attribute
+
+    self.ticks += 1
+    self.lastReads = len(attrs)
+    self.totalReads += len(attrs)
+    return self.apply(values)
+
+  '''
+  Fans the attribute ~values~ (dict attribute => value) out to the controls mirroring them
+  Controls which have focus are skipped to not interfere with the user,
+  a control failing to display the value does not stop the others
+  Returns the number of controls actually updated
+  '''
+  def apply(self, values):
+    updated = 0
+    for attr, val in values.items():
+      for control in self.watchers.get(attr, []):
+        try:
+          if not control.widget.hasFocus() and control.applyValue(val): # unchanged values are skipped by the controls
+            updated += 1
+        except Exception: # misconfigured control (e.g. empty slider range), retried on the next update
+          self.errors += 1
+
+    self.lastControls = updated
+    return updated
+
+
+'''
+Adaptive interval for the polling updates
+The interval grows (up to ~maxInterval~) while consecutive ticks find nothing changed
+and drops back to ~minInterval~ as soon as something changes or the user starts interacting
+'''
+class UpdatePolicy(object):
+  def __init__(self, minInterval=100, maxInterval=4000, backoff=2.0, patience=3):
+    self.minInterval = minInterval # interval (ms) used while the attributes are changing
+    self.maxInterval = maxInterval # interval (ms) used when the scene sits idle
+    self.backoff = backoff # interval multiplier applied on every idle tick
+    self.patience = patience # idle ticks tolerated before backing off
+    self.interval = minInterval # current interval (ms)
+    self.idleTicks = 0 # consecutive ticks without changes
+    self.ticks = 0 # number of recorded ticks
+    self.hits = 0 # number of recorded ticks which found changes
+
+  '''
+  Adjusts the interval according to the result of a tick
+  '''
+  def record(self, changed):
+    self.ticks += 1
+    if changed:
+      self.hits += 1
+      self.idleTicks = 0
+      self.interval = self.minInterval # things are moving => poll fast
+    else:
+      self.idleTicks += 1
+      if self.idleTicks > self.patience: # idle for a while => back off
+        self.interval = min(self.maxInterval, int(self.interval * self.backoff))
+    return self.interval
+
+  '''
+  Switches to the shortest interval (user interaction, playback or scrubbing)
+  '''
+  def boost(self):
+    self.idleTicks = 0
+    self.interval = self.minInterval
+    return self.interval
+
+  '''
+  Returns the share of ticks which found changes
+  '''
+  def hitRate(self):
+    if not self.ticks:
+      return 0.0
+    return float(self.hits) / self.ticks
+
+
+'''
+Process-wide owner of all the update work of the viewer tabs
+A single timer and a single set of attribute watchers serve every open tab. Each tick
+queues the union of the attributes requested by the visible tabs, every attribute only once,
+so the tabs pointing at the same rig share the reads. Hidden tabs are skipped and refreshed when shown
+The queue is processed in slices which stop after ~budget~ ms, the next slice resumes
+on the next event loop turn where the last one stopped. Attributes of the controls
+under the mouse or near the focused widget are processed first
+'''
+class UpdateScheduler(QObject):
+  def __init__(self, notifier=None, budget=4):
+    super(UpdateScheduler, self).__init__()
+    self.notifier = notifier or AttributeNotifier() # attribute watchers shared by the event mode tabs
+    self.budget = budget # time (ms) a single slice may take
+    self.tabs = [] # registered tabs
+    self.due = {} # timer mode tab => time (ms) of its next poll
+    self.stale = set() # tabs which have to be refreshed completely
+    self.dirty = set() # attributes reported changed since the last tick
+    self.queue = collections.deque() # attributes waiting to be read in round robin order
+    self.pending = {} # queued attribute => tabs waiting for it
+    self.outstanding = {} # tab => number of its queued attributes
+    self.progress = {} # tab => controls updated since its attributes were queued
+    self.timer = QTimer(self) # the only update timer
+    self.timer.setSingleShot(True)
+    self.timer.timeout.connect(self.tick)
+    self.nextTick = 0 # time (ms) the timer is going to fire at
+    self.timeChangedSJ = None # Maya script job to follow the animation while the animators scrub or play back
+    self.ticks = 0 # number of ticks performed
+    self.slices = 0 # number of slices performed
+    self.lastRequests = 0 # attributes requested by the tabs during the last tick
+    self.lastReads = 0 # unique attributes actually read during the last slice
+    self.lastTickReads = 0 # unique attributes read by the last tick, from queueing until the queue drained
+    self.tickReads = set() # attributes read since the queue was last empty
+    self.totalRequests = 0
+    self.totalReads = 0
+    self.lastSlice = 0 # duration (ms) of the last slice
+    self.worstSlice = 0 # duration (ms) of the longest slice
+
+  '''
+  Current time in milliseconds
+  '''
+  def now(self):
+    return time.time() * 1000
+
+  '''
+  Starts updating ~tab~
+  '''
+  def register(self, tab):
+    if tab in self.tabs:
+      return
+
+    self.tabs.append(tab)
+    if self.timeChangedSJ is None: # first tab
+      self.timeChangedSJ = self.notifier.watchEvent("timeChanged", self.onTimeChanged)
+    self.refresh(tab)
+
+  '''
+  Stops updating ~tab~ and drops its attribute watchers
+  '''
+  def unregister(self, tab):
+    if tab not in self.tabs:
+      return
+
+    self.tabs.remove(tab)
+    self.due.pop(tab, None)
+    self.stale.discard(tab)
+    self.outstanding.pop(tab, None)
+    self.progress.pop(tab, None)
+    for tabs in self.pending.values(): # the queued attributes are not needed by this tab anymore
+      tabs.discard(tab)
+    if tab.updateMode == UpdateMode.event:
+      for attr in tab.engine.attributes():
+        self.unwatch(attr)
+
+    if not self.tabs: # last tab gone
+      self.timer.stop()
+      self.killScriptJob()
+
+  '''
+  Stops all the update work
+  '''
+  def stop(self):
+    self.timer.stop()
+    self.killScriptJob()
+    self.notifier.clear()
+    self.tabs = []
+    self.due = {}
+    self.stale = set()
+    self.dirty = set()
+    self.queue.clear()
+    self.pending = {}
+    self.outstanding = {}
+    self.progress = {}
+    self.tickReads = set()
+
+  def killScriptJob(self):
+    if self.timeChangedSJ is not None:
+      self.notifier.unwatch(self.timeChangedSJ)
+      self.timeChangedSJ = None
+
+  '''
+  Starts reporting the changes of ~attr~ (for the event mode tabs)
+  '''
+  def watch(self, attr):
+    return self.notifier.subscribe(attr, self.onAttributeChanged)
+
+  '''
+  Stops reporting the changes of ~attr~ once no tab is watching it
+  '''
+  def unwatch(self, attr):
+    self.notifier.unsubscribe(attr, self.onAttributeChanged)
+
+  '''
+  Called by the notifier, the changes are processed on the next event loop turn
+  '''
+  def onAttributeChanged(self, attr):
+    self.dirty.add(attr)
+    self.schedule(0)
+
+  '''
+  Makes ~tab~ refresh all of its controls on the next tick (shown, reconfigured etc.)
+  '''
+  def refresh(self, tab):
+    self.stale.add(tab)
+    self.schedule(0)
+
+  '''
+  Switches ~tab~ to the fastest polling (the user is interacting with it)
+  '''
+  def boost(self, tab):
+    if tab.updateMode != UpdateMode.timer or tab not in self.tabs:
+      return
+
+    tab.policy.boost()
+    due = self.now() + tab.policy.interval
+    if due < self.due.get(tab, due + 1):
+      self.due[tab] = due
+    self.reschedule()
+
+  '''
+  Switches all the tabs to the fastest polling (scrubbing or playback)
+  '''
+  def boostAll(self):
+    for tab in self.tabs:
+      self.boost(tab)
+
+  '''
+  Called by Maya when the current time changes (scrubbing or playback)
+  The values driven by animation are not reported by the attribute watchers,
+  so the event mode tabs are refreshed and the timer mode tabs switch to the fastest polling
+  '''
+  def onTimeChanged(self):
+    for tab in self.tabs:
+      if tab.updateMode == UpdateMode.event:
+        self.refresh(tab)
+      else:
+        self.boost(tab)
+
+  '''
+  Makes the timer fire in ~delay~ ms unless it is going to fire earlier anyway
+  '''
+  def schedule(self, delay):
+    at = self.now() + delay
+    if self.timer.isActive() and self.nextTick <= at:
+      return
+    self.nextTick = at
+    self.timer.start(max(0, int(delay)))
+
+  '''
+  Arms the timer for the earliest due poll of the visible tabs
+  '''
+  def reschedule(self):
+    due = [self.due.get(tab, 0) for tab in self.tabs if tab.updateMode == UpdateMode.timer and tab.isVisible()]
+    if due:
+      self.schedule(min(due) - self.now())
+
+  '''
+  Queues the update work of all the visible tabs and processes the first slice
+  '''
+  def tick(self):
+    now = self.now()
+    self.lastRequests = 0
+
+    for tab in self.tabs:
+      if not tab.isVisible(): # hidden tabs are refreshed once shown
+        continue
+
+      if tab in self.stale: # refresh everything
+        self.enqueue(tab, tab.engine.collect())
+        self.stale.discard(tab)
+
+      elif tab.updateMode == UpdateMode.timer:
+        if self.outstanding.get(tab) or self.due.get(tab, 0) > now: # still busy or not yet
+          continue
+        if tab.isIdle():
+          self.enqueue(tab, tab.engine.collect())
+        else: # the user is working with the tab
+          tab.policy.boost()
+          self.due[tab] = now + tab.policy.interval
+
+      elif self.dirty: # event mode
+        self.enqueue(tab, tab.engine.collect(self.dirty))
+
+    self.dirty = set()
+    self.ticks += 1
+    self.totalRequests += self.lastRequests
+    self.process()
+
+  '''
+  Queues ~attrs~ to be read for ~tab~, the attributes already queued for other tabs are shared
+  '''
+  def enqueue(self, tab, attrs):
+    for attr in attrs:
+      tabs = self.pending.get(attr)
+      if tabs is None: # first request => join the end of the queue
+        tabs = self.pending[attr] = set()
+        self.queue.append(attr)
+      if tab not in tabs:
+        tabs.add(tab)
+        self.outstanding[tab] = self.outstanding.get(tab, 0) + 1
+    self.lastRequests += len(attrs)
+
+    if not self.outstanding.get(tab): # nothing to wait for
+      self.finish(tab)
+
+  '''
+  Called when all the queued attributes of ~tab~ have been processed
+  '''
+  def finish(self, tab):
+    updated = self.progress.pop(tab, 0)
+    self.outstanding.pop(tab, None)
+    if tab.updateMode == UpdateMode.timer:
+      tab.policy.record(updated > 0) # adapt the interval to the scene activity
+      self.due[tab] = self.now() + tab.policy.interval
+
+  '''
+  Reads the queued attributes and feeds them to the tabs until the time budget runs out
+  '''
+  def process(self):
+    start = self.now()
+    hot = [] # attributes of the controls the user is looking at
+    for tab in self.outstanding.keys():
+      if tab.isVisible():
+        hot.extend(attr for attr in tab.hotAttributes() if attr in self.pending)
+
+    reads = 0
+    while self.pending:
+      attr = hot.pop() if hot else self.queue.popleft()
+      tabs = self.pending.pop(attr, None)
+      if tabs is None: # already processed out of order
+        continue
+
+      values = utils.getAttrs([attr])
+      reads += 1
+      self.tickReads.add(attr)
+      for tab in tabs:
+        try:
+          if attr in values:
+            self.progress[tab] = self.progress.get(tab, 0) + tab.engine.apply(values)
+        finally: # the attribute is processed even if the tab failed, otherwise the tab is never polled again
+          self.outstanding[tab] -= 1
+          if not self.outstanding[tab]:
+            self.finish(tab)
+
+      if self.now() - start >= self.budget: # out of time
+        break
+
+    if not self.pending:
+      self.queue.clear() # drop the entries processed out of order
+      self.lastTickReads = len(self.tickReads) # the tick is complete
+      self.tickReads = set()
+
+    self.slices += 1
+    self.lastReads = reads
+    self.totalReads += reads
+    self.lastSlice = self.now() - start
+    self.worstSlice = max(self.worstSlice, self.lastSlice)
+
+    if self.pending:
+      self.schedule(0) # resume on the next event loop turn
+    else:
+      self.reschedule()
+
+
+SCHEDULER = None # process-wide scheduler instance
+
+'''
+Returns the process-wide scheduler, creating it if necessary
+'''
+def scheduler():
+  global SCHEDULER
+  if SCHEDULER is None:
+    SCHEDULER = UpdateScheduler()
+  return SCHEDULER
+
+'''
+Stops and drops the process-wide scheduler
+'''
+def shutdown():
+  global SCHEDULER
+  if SCHEDULER is not None:
+    SCHEDULER.stop()
+    SCHEDULER = None
@@ -1,7 +1,9 @@
+import collections
 import functools
 import math
 import pymel.core as pm
-from PySide.QtCore import QPoint
+import maya.cmds as mc
+from PySide.QtCore import QPoint, QTimer
 
 '''
 This block of code is responsible for maintainting
@@ -29,6 +31,189 @@ undoable_b = functools.partial(pm.undoInfo, ock=1) # opens local chunk
 undoable_e = functools.partial(pm.undoInfo, cck=1) # closes local chunk
 
 
+'''
+Dictionary-like cache keeping at most ~size~ most recently used entries
+'''
+class LRUCache(object):
+  def __init__(self, size):
+    self.size = size
+    self.entries = collections.OrderedDict() # the least recently used entries come first
+    self.hits = 0
+    self.misses = 0
+
+  def __len__(self):
+    return len(self.entries)
+
+  def __contains__(self, key):
+    return key in self.entries
+
+  '''
+  Returns the value cached for ~key~ or ~default~
+  '''
+  def get(self, key, default=None):
+    try:
+      value = self.entries.pop(key)
+    except KeyError:
+      self.misses += 1
+      return default
+    self.entries[key] = value # mark as the most recently used
+    self.hits += 1
+    return value
+
+  '''
+  Caches ~value~ for ~key~ evicting the least recently used entries if full
+  '''
+  def put(self, key, value):
+    self.entries.pop(key, None)
+    self.entries[key] = value
+    while len(self.entries) > self.size:
+      self.entries.popitem(last=False)
+
+  '''
+  Drops the entry for ~key~ if cached
+  '''
+  def discard(self, key):
+    self.entries.pop(key, None)
+
+  def clear(self):
+    self.entries.clear()
+
+
+'''
+Collapses bursts of calls into a single call of ~func~ on the next event loop turn
+~defer~ schedules the flush (QTimer.singleShot by default), a stand-in may call the flush by hand
+'''
+class Debouncer(object):
+  def __init__(self, func, defer=None):
+    self.func = func
+    self.defer = defer or (lambda flush: QTimer.singleShot(0, flush))
+    self.pending = False # a flush has been scheduled
+    self.calls = 0 # number of received calls
+    self.flushes = 0 # number of performed calls of func
+
+  '''
+  Registers a call, the arguments are ignored
+  '''
+  def trigger(self, *args):
+    self.calls += 1
+    if not self.pending: # first call of the burst => schedule the flush
+      self.pending = True
+      self.defer(self.flush)
+
+  '''
+  Calls ~func~ once for all the calls received since the last flush
+  '''
+  def flush(self):
+    if not self.pending: # cancelled or flushed already
+      return
+    self.pending = False
+    self.flushes += 1
+    self.func()
+
+  '''
+  Drops the scheduled flush
+  '''
+  def cancel(self):
+    self.pending = False
+
+
+'''
+Reads the values of ~attrs~ one plug at a time (using maya.cmds, which is much cheaper than PyMEL)
+Returns dict attribute => value, the attributes which could not be read are left out
+'''
+def getAttrs(attrs):
+  values = {}
+  for attr in attrs:
+    try:
+      values[attr] = mc.getAttr(attr)
+    except Exception: # attribute is not accessible or does not exist
+      pass
+  return values
+
+
+'''
+Computes the selection resulting from activating the selectors with target object lists ~groups~
+one after another by dragging (see Selector.action), starting from the ~selection~ (list of object names):
+a group which is selected entirely is removed from the selection, otherwise it is added
+Returns the resulting selection list, nothing is selected in the scene
+'''
+def toggleGroups(selection, groups):
+  selected = collections.OrderedDict((obj, None) for obj in selection) # ordered set
+  for targets in groups:
+    if all(obj in selected for obj in targets): # selected => remove from selection
+      for obj in targets:
+        selected.pop(obj, None)
+    else: # add to selection
+      for obj in targets:
+        if obj not in selected:
+          selected[obj] = None
+  return selected.keys()
+
+'''
+Ways of applying a set of objects to the scene selection
+'''
+class SelectionMode:
+  replace = 0
+  add = 1
+  remove = 2
+  toggle = 3
+
+'''
+Applies ~objs~ to the scene selection according to ~mode~ (see SelectionMode)
+using a single command (one SelectionChanged event, one undo entry)
+'''
+def selectObjects(objs, mode=SelectionMode.replace):
+  objs = collections.OrderedDict((obj, None) for obj in objs).keys() # dedupe keeping the order
+
+  if mode == SelectionMode.replace:
+    if objs:
+      pm.select(objs, replace=1)
+    else:
+      pm.select(clear=1)
+  elif not objs: # nothing to add/remove/toggle
+    return
+  elif mode == SelectionMode.add:
+    pm.select(objs, add=1)
+  elif mode == SelectionMode.remove:
+    pm.select(objs, deselect=1)
+  elif mode == SelectionMode.toggle:
+    pm.select(objs, toggle=1)
+  else:
+    raise ValueError("Unknown selection mode: {}".format(mode))
+
+
+'''
+Shows (~state~ is True) or hides all ~objs~ with a single command inside a single undo chunk
+The objects already in the requested state are not touched
+Returns dict with the lists of "changed", "unchanged" and "missing" objects
+'''
+def setVisibility(objs, state):
+  summary = {"changed": [], "unchanged": [], "missing": []}
+  seen = set()
+  for obj in objs:
+    if obj in seen: # dedupe
+      continue
+    seen.add(obj)
+
+    try:
+      visible = mc.getAttr(obj + ".visibility")
+    except Exception: # object does not exist
+      summary["missing"].append(obj)
+      continue
+    summary["unchanged" if bool(visible) == bool(state) else "changed"].append(obj)
+
+  if summary["changed"]:
+    undoable_b() # one undo entry for the whole change
+    try:
+      if state:
+        mc.showHidden(summary["changed"])
+      else:
+        mc.hide(summary["changed"])
+    finally:
+      undoable_e()
+  return summary
+
+
 '''
 Calculates the upper left and lower right corners
 of drag area specified by drag ~start~ and ~end~ positions
@@ -102,9 +287,7 @@ def getOverrideColor(obj):
   colorId = getOverrideColorId(obj) # search for colorIndex of the obj or its parents
 
   if colorId:
-    floatColor = pm.colorIndex(colorId, q=1) # get float RGB values from Maya for given id
-    intVal = [int(math.ceil(v*255)) for v in floatColor] # convert float values to integers
-    return hexColor(intVal) # convert to hex and return
+    return colorIndexTable().get(colorId) # convert to hex
   else:
     return None
 
@@ -127,6 +310,87 @@ def getOverrideColorId(obj, first_lvl=True):
       else:
         return 0 # if has no parent and not own OC
 
+COLOR_INDEX_TABLE = None # colorIndex => hex color, queried once per session
+
+'''
+Returns the table of hex forms of Maya index colors
+'''
+def colorIndexTable():
+  global COLOR_INDEX_TABLE
+  if COLOR_INDEX_TABLE is None:
+    COLOR_INDEX_TABLE = {}
+    for colorId in range(1, 32): # index 0 means no override color
+      floatColor = pm.colorIndex(colorId, q=1) # get float RGB values from Maya for given id
+      intVal = [int(math.ceil(v*255)) for v in floatColor] # convert float values to integers
+      COLOR_INDEX_TABLE[colorId] = hexColor(intVal)
+  return COLOR_INDEX_TABLE
+
+'''
+Resolves the override colors (see getOverrideColor) of many objects at once
+The colors inherited from the transforms up the hierarchy are memoized per DAG node,
+so the objects under the same colored group do not walk the hierarchy again
+'''
+class OverrideColorResolver(object):
+  def __init__(self):
+    self.inherited = {} # DAG node (full path) => override color index inherited from its transforms
+    self.colors = {} # object name => hex color or None
+
+  '''
+  Returns the hex form of the override color for ~obj~ or None
+  Raises ValueError if the object does not exist
+  '''
+  def color(self, obj):
+    if obj not in self.colors:
+      colorId = self.colorId(obj)
+      self.colors[obj] = colorIndexTable().get(colorId) if colorId else None
+    return self.colors[obj]
+
+  '''
+  Resolves the colors of all ~objs~ in a single pass
+  Returns dict object name => hex color or None, missing objects are left out
+  '''
+  def resolve(self, objs):
+    colors = {}
+    for obj in objs:
+      try:
+        colors[obj] = self.color(obj)
+      except Exception: # object does not exist or is not a DAG node
+        pass
+    return colors
+
+  '''
+  Returns the override color index of ~obj~: its transform, its shape or the transforms above
+  '''
+  def colorId(self, obj):
+    nodes = mc.ls(obj, long=True)
+    if not nodes:
+      raise ValueError("Object {} not found".format(obj))
+    node = nodes[0]
+
+    xformColor = mc.getAttr(node + ".overrideColor") # OC of the transform node
+    if xformColor:
+      return xformColor
+
+    shapes = mc.listRelatives(node, shapes=True, fullPath=True)
+    if shapes:
+      shapeColor = mc.getAttr(shapes[0] + ".overrideColor") # OC of the shape node
+      if shapeColor:
+        return shapeColor
+
+    return self.inheritedColorId(node)
+
+  '''
+  Returns the first override color index set on the transforms above ~node~ (full DAG path)
+  '''
+  def inheritedColorId(self, node):
+    parent = node.rpartition("|")[0] # the full path of the parent is the prefix of the node path
+    if not parent: # top of the hierarchy
+      return 0
+
+    if parent not in self.inherited:
+      self.inherited[parent] = mc.getAttr(parent + ".overrideColor") or self.inheritedColorId(parent)
+    return self.inherited[parent]
+
 '''
 Returns hex form of color for given list of integer RGB values
 '''
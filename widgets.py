@@ -1,8 +1,10 @@
 from PySide.QtGui import *
 from PySide.QtCore import *
+import collections
 import os
 import pymel.core as pm
 import utils
+import indexes
 
 DEFAULT_COMMAND_BUTTON_CODE = """def clicked():
   pass
@@ -18,13 +20,144 @@ def off():
 # only the code inside on() and off() will be executed
 """
 
+class RenderMode: # enum for selector rendering strategies
+  widgets = 0 # every selector is a QPushButton styled by selector.qss
+  canvas = 1 # all the selectors are painted by a single SelectorCanvas
+
+SELECTOR_TEMPLATE = None # contents of selector.qss, loaded once per process
+SELECTOR_STYLESHEETS = utils.LRUCache(512) # (color, radius, selected) => rendered selector stylesheet
+
+'''
+Returns the selector stylesheet template
+'''
+def selectorTemplate():
+  global SELECTOR_TEMPLATE
+  if SELECTOR_TEMPLATE is None:
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'selector.qss'), 'r') as qss_file:
+      SELECTOR_TEMPLATE = qss_file.read()
+  return SELECTOR_TEMPLATE
+
+'''
+Returns the stylesheet for a selector of given ~color~ and ~radius~
+Rendered once for every visual state, the selectors looking the same share the string
+'''
+def selectorStyleSheet(color, radius, selected):
+  key = (color, radius, selected)
+  stylesheet = SELECTOR_STYLESHEETS.get(key)
+  if stylesheet is None: # never seen before => render
+    radius = radius - 1.3 if selected else radius # taking the border into account
+    stylesheet = selectorTemplate().format(
+      color=color,
+      brighter=utils.brighter(color),
+      darker=utils.darker(color),
+      radius=radius,
+      double_radius=radius * 2,
+      border=2 if selected else 0 # show 2 pixel border if the selector is activated
+    )
+    SELECTOR_STYLESHEETS.put(key, stylesheet)
+  return stylesheet
+
+'''
+Declaration of a serialized setting of the controls
+~key~ - name in the layout file and of the control attribute, ~default~ - value used when missing in the file
+~kind~ - "int", "float", "bool", "string" or "strings" (list of strings, copied on load)
+'''
+class Field(object):
+  def __init__(self, key, kind, default):
+    self.key = key
+    self.kind = kind
+    self.default = default
+
+CONTROL_TYPES = collections.OrderedDict() # type name => control class (see registerControl)
+
+'''
+Class decorator adding a control type to the registry
+The class declares its type name (TYPE), binary type code (CODE, see layout.py), the signal
+picking the control in CUI Builder (TRIGGER) and its settings (FIELDS),
+the serialize/deserialize methods are generated from the declarations
+'''
+def registerControl(cls):
+  for other in CONTROL_TYPES.values():
+    if other.CODE == cls.CODE and other.TYPE != cls.TYPE:
+      raise ValueError("Control types {} and {} share the code {}".format(other.TYPE, cls.TYPE, cls.CODE))
+
+  generateSerializers(cls)
+  CONTROL_TYPES[cls.TYPE] = cls
+  return cls
+
+'''
+Returns the control class registered for ~controlType~ or None
+'''
+def controlClass(controlType):
+  return CONTROL_TYPES.get(controlType)
+
+'''
+Compiles the serialize/deserialize methods of the control class ~cls~ from its FIELDS
+The generated code accesses every setting directly, so (de)serialization costs no per-field lookups
+'''
+def generateSerializers(cls):
+  namespace = {"QPoint": QPoint}
+  code = [
+    "def serialize(self):",
+    "  return {{{!r}: {{".format(cls.TYPE),
+    "    'cid': self.cid,",
+    "    'pos_x': self.pos.x(),",
+    "    'pos_y': self.pos.y(),"
+  ]
+  for field in cls.FIELDS:
+    value = "self.{}".format(field.key)
+    if field.kind == "strings":
+      value = "list({})".format(value) # copy, the snapshot may be written by another thread (see layout.SaveThread)
+    code.append("    {!r}: {},".format(field.key, value))
+  code.append("  }}")
+
+  code += [
+    "def deserialize(self, json, duplicate=False):",
+    "  if not duplicate:",
+    "    self.cid = json['cid']",
+    "    self.pos = QPoint(json['pos_x'], json['pos_y'])",
+    "  get = json.get"
+  ]
+  for i, field in enumerate(cls.FIELDS):
+    default = "default{}".format(i)
+    namespace[default] = field.default
+    value = "get({!r}, {})".format(field.key, default)
+    if field.kind == "strings":
+      value = "list({})".format(value) # copy, the parsed layout may be shared
+    code.append("  self.{} = {}".format(field.key, value))
+
+  exec("\n".join(code) + "\n", namespace)
+  cls.serialize = namespace["serialize"]
+  cls.deserialize = namespace["deserialize"]
+
+
 class BaseControl(QObject):
+  moved = Signal()
+  configured = Signal() # settings changed by a setup dialog
+  TYPE = None # type name in the layout files
+  CODE = None # type code in the binary layout files
+  TRIGGER = None # name of the signal picking the control in CUI Builder
+  FIELDS = [] # serialized settings besides cid and position (see Field)
+
+  '''
+  Creates the control from its serialized ~data~ and applies the settings
+  ~context~ carries the optional loading helpers (see Selector.load)
+  '''
+  @classmethod
+  def load(cls, parent, data, client=False, **context):
+    control = cls(parent)
+    control.deserialize(data)
+    control.setup(client=client)
+    return control
+
   def __init__(self):
     super(BaseControl, self).__init__()
+    self.cachedValue = None # last attribute value displayed by the control
 
   def move(self, pos):
     self.pos = pos
     self.widget.move(pos)
+    self.moved.emit() # let the owner update its indexes
 
   def show(self):
     self.widget.show()
@@ -38,12 +171,72 @@ class BaseControl(QObject):
     self.widget.deleteLater()
     self.deleteLater()
 
+  '''
+  Update the control to match current attribute value
+  '''
   def updateControl(self):
-    pass
+    attr = self.syncedAttr()
+    if attr is None: # nothing to mirror
+      return
+
+    try:
+      val = pm.getAttr(attr) # get the current value
+    except Exception: # if attribute is not accessible or does not exist
+      return
+    self.applyValue(val)
 
+  '''
+  Display the attribute value ~val~ read by updateControl() or the update engine
+  Returns True if the widget had to be updated
+  '''
+  def applyValue(self, val):
+    return False
 
+  '''
+  Returns True if the attribute value ~val~ would change what the widget displays
+  and remembers the displayed value, so unchanged values cost nothing
+  '''
+  def isNewValue(self, val):
+    shown = self.displayedValue(val)
+    if self.cachedValue is not None and shown == self.cachedValue:
+      return False
+    self.cachedValue = shown
+    return True
+
+  '''
+  Returns the value the widget displays for the attribute value ~val~ (after its rounding)
+  '''
+  def displayedValue(self, val):
+    return val
+
+  '''
+  Forget the displayed value, must be called whenever the widget is changed not from the attribute
+  '''
+  def invalidate(self):
+    self.cachedValue = None
+
+  '''
+  Returns the Maya attribute mirrored by the control or None
+  '''
+  def syncedAttr(self):
+    return None
+
+
+@registerControl
 class Selector(BaseControl):
   clicked = Signal()
+  targetsChanged = Signal()
+  TYPE = "selector"
+  CODE = 0
+  TRIGGER = "clicked"
+  FIELDS = [
+    Field("target_objs", "strings", ()),
+    Field("color", "string", "#FFFFFF"),
+    Field("tags", "strings", ()),
+    Field("override_color", "bool", False),
+    Field("tooltip", "string", ""),
+    Field("radius", "int", 10)
+  ]
 
   def __init__(self, p, **kwargs):
     super(Selector, self).__init__()
@@ -57,27 +250,34 @@ class Selector(BaseControl):
     self.tooltip = ""
     self.radius = 10
     self.is_selected = False
+    self.is_previewed = False # inside the rubber band during drag selection
+    self.stylesheet = None # stylesheet currently applied to the widget
+    self.canvas = kwargs.get("canvas") # SelectorCanvas painting the selector (canvas rendering mode)
 
-    self.widget = QPushButton(p) # underlying Qt widget
+    if self.canvas is not None:
+      self.widget = self.canvas.addItem() # lightweight item painted by the canvas
+    else:
+      self.widget = QPushButton(p) # underlying Qt widget
     self.widget.setText("") # clear the label
 
-    # load the stylesheet for the selector
-    with open(os.path.abspath(os.path.dirname(__file__)) + '\\selector.qss', 'r') as qss_file:
-      self.stylesheet = qss_file.read()
-
     self.setup() # apply settings
     self.widget.show() 
     
     self.widget.clicked.connect(self.onWidgetTriggered)
 
-  def colorCode(self):
-    if self.override_color:
+  '''
+  Take the override color of the first target object
+  ~colors~ is an OverrideColorResolver shared by the selectors being loaded together
+  '''
+  def colorCode(self, colors=None):
+    if self.override_color and self.target_objs:
+      if colors is None:
+        colors = utils.OverrideColorResolver()
       try:
-        top_obj = pm.PyNode(self.target_objs[0]) # get the first of the target objects
-      except: # if target object does not exist display the warning
+        color = colors.color(self.target_objs[0]) # get the override color of the first target object (see utils.py)
+      except ValueError: # if target object does not exist display the warning
         pm.warning("Object {} not found. Make sure the correct scene is loaded.".format(self.target_objs[0]))
         return
-      color = utils.getOverrideColor(top_obj) # set the override color (see utils.py)
       if color:
         self.color = color
 
@@ -101,58 +301,42 @@ class Selector(BaseControl):
   def onWidgetTriggered(self):
     self.clicked.emit()
 
-  def redraw(self):
-    radius = self.radius - 1.3 if self.is_selected else self.radius # taking the border into account
-    args = {
-      "color": self.color,
-      "brighter": utils.brighter(self.color),
-      "darker": utils.darker(self.color),
-      "radius": radius,
-      "double_radius": radius * 2,
-      "border": 2 if self.is_selected else 0 # show 2 pixel border if the selector is activated
-    }
-    self.widget.setStyleSheet(self.stylesheet.format(**args)) # redraw the widget
-
   '''
-  Returns JSON representation of the control
+  Replace the target objects, lets the indexes of the owner know
   '''
-  def serialize(self):
-    return {
-    "selector" : {
-        "cid": self.cid,
-        "target_objs": self.target_objs,
-        "color": self.color,
-        "tags": self.tags,
-        "override_color": self.override_color,
-        "tooltip": self.tooltip,
-        "pos_x": self.pos.x(),
-        "pos_y": self.pos.y(),
-        "radius": self.radius
-      }
-    }
+  def setTargets(self, objs):
+    self.target_objs = objs
+    self.targetsChanged.emit()
+
+  def redraw(self):
+    highlighted = self.is_selected or self.is_previewed # both are circled
+    if self.canvas is not None: # painted by the canvas
+      self.widget.setAppearance(self.color, self.radius, highlighted)
+      return
+
+    stylesheet = selectorStyleSheet(self.color, self.radius, highlighted) # shared by the selectors looking the same
+    if stylesheet is not self.stylesheet: # setStyleSheet is expensive, skip it if nothing changed
+      self.stylesheet = stylesheet
+      self.widget.setStyleSheet(stylesheet) # redraw the widget
 
   '''
-  Loads the control from JSON representation
+  Selectors are painted by the ~canvas~ in the canvas rendering mode
+  ~colors~ resolves their override colors (see utils.OverrideColorResolver)
   '''
-  def deserialize(self, json, duplicate=False):
-    if not duplicate:
-      self.cid = json["cid"]
-      self.pos = QPoint(json["pos_x"], json["pos_y"])
-
-    self.target_objs = json["target_objs"]
-    self.color = json["color"]
-    self.tags = json["tags"]
-    self.override_color = json["override_color"]
-    self.tooltip = json["tooltip"]
-    self.radius = json.get("radius", 10)
+  @classmethod
+  def load(cls, parent, data, client=False, canvas=None, colors=None):
+    control = cls(parent, canvas=canvas)
+    control.deserialize(data)
+    control.setup(client=client, colors=colors)
+    return control
 
   '''
   Apply the settings to control
   '''
-  def setup(self, client=False):
+  def setup(self, client=False, colors=None):
     if client: # if loaded by CUI Viewer
       self.widget.setToolTip(self.tooltip)
-      self.colorCode()
+      self.colorCode(colors)
       self.clicked.connect(self.action)
     else:
       self.widget.setToolTip("Control ID: {}".format(self.cid)) # show cid in tooltip
@@ -160,8 +344,308 @@ class Selector(BaseControl):
     self.move(self.pos) # move into place
 
 
+'''
+Selector stand-in for the QPushButton in the canvas rendering mode
+Implements the part of the widget interface used by the controls and the tabs
+'''
+class CanvasItem(QObject):
+  clicked = Signal()
+
+  def __init__(self, canvas):
+    super(CanvasItem, self).__init__()
+    self.canvas = canvas
+    self.rect = QRect(0, 0, 20, 20) # area covered on the canvas
+    self.visible = False
+    self.tooltip = ""
+    self.color = "#FFFFFF"
+    self.selected = False
+
+  def setText(self, text):
+    pass # selectors have no label
+
+  def setToolTip(self, tooltip):
+    self.tooltip = tooltip
+
+  def toolTip(self):
+    return self.tooltip
+
+  def hasFocus(self):
+    return False # items never take the keyboard focus
+
+  def move(self, pos):
+    self.canvas.updateItem(self) # repaint the old area
+    self.rect.moveTopLeft(pos)
+    self.canvas.reindexItem(self)
+    self.canvas.updateItem(self)
+
+  def show(self):
+    self.visible = True
+    self.canvas.updateItem(self)
+
+  def hide(self):
+    self.visible = False
+    self.canvas.updateItem(self)
+
+  def isVisible(self):
+    return self.visible
+
+  def pos(self):
+    return self.rect.topLeft()
+
+  def geometry(self):
+    return QRect(self.rect)
+
+  def width(self):
+    return self.rect.width()
+
+  def height(self):
+    return self.rect.height()
+
+  '''
+  Sets the look of the item (see Selector.redraw)
+  '''
+  def setAppearance(self, color, radius, selected):
+    self.canvas.updateItem(self) # repaint the old area
+    self.color = color
+    self.selected = selected
+    self.rect.setSize(QSize(int(radius * 2), int(radius * 2)))
+    self.canvas.reindexItem(self)
+    self.canvas.updateItem(self)
+
+  def deleteLater(self):
+    self.canvas.removeItem(self)
+    super(CanvasItem, self).deleteLater()
+
+
+'''
+Pre-rendered sprites of the selectors in the canvas rendering mode
+Every unique (color, size, selected, state) combination is rasterized once and then
+only blitted by the canvases, the least recently used sprites are dropped when full
+'''
+class SelectorAtlas(object):
+  normal = 0 # sprite states
+  hover = 1
+  pressed = 2
+  BORDER_COLOR = "#8BCEF0" # color of the selected selectors outline (see selector.qss)
+
+  def __init__(self, size=1024):
+    self.sprites = utils.LRUCache(size) # (color, size, selected, state) => QPixmap
+
+  '''
+  Returns the sprite for the selector of given ~color~ and ~size~ (diameter in px) in ~state~
+  '''
+  def sprite(self, color, size, selected, state):
+    key = (color, size, selected, state)
+    pixmap = self.sprites.get(key)
+    if pixmap is None: # never seen before => render
+      pixmap = self.render(color, size, selected, state)
+      self.sprites.put(key, pixmap)
+    return pixmap
+
+  '''
+  Paints the sprite the way selector.qss styles the selector buttons
+  '''
+  def render(self, color, size, selected, state):
+    if state == self.pressed:
+      color = utils.darker(color)
+    elif state == self.hover:
+      color = utils.brighter(color)
+
+    pixmap = QPixmap(max(size, 1), max(size, 1))
+    pixmap.fill(Qt.transparent)
+    painter = QPainter(pixmap)
+    painter.setRenderHint(QPainter.Antialiasing)
+
+    rect = QRectF(0, 0, size, size)
+    gradient = QRadialGradient(rect.center(), rect.width()) # same as qradialgradient(radius:1)
+    gradient.setColorAt(0, QColor(color))
+    gradient.setColorAt(1, QColor("#000000"))
+    painter.setBrush(QBrush(gradient))
+
+    if selected: # 2 pixel outline
+      painter.setPen(QPen(QColor(self.BORDER_COLOR), 2))
+      rect.adjust(1, 1, -1, -1)
+    else:
+      painter.setPen(Qt.NoPen)
+    painter.drawEllipse(rect)
+    painter.end()
+    return pixmap
+
+  '''
+  Returns the cache statistics
+  '''
+  def stats(self):
+    return {
+      "hits": self.sprites.hits,
+      "misses": self.sprites.misses, # number of rendered sprites
+      "sprites": len(self.sprites),
+      "capacity": self.sprites.size
+    }
+
+SELECTOR_ATLAS = None # process-wide atlas shared by all the canvases
+
+'''
+Returns the process-wide selector atlas (created on first use, QPixmap needs QApplication)
+'''
+def selectorAtlas():
+  global SELECTOR_ATLAS
+  if SELECTOR_ATLAS is None:
+    SELECTOR_ATLAS = SelectorAtlas()
+  return SELECTOR_ATLAS
+
+
+'''
+Single widget painting all the selectors of a tab in the canvas rendering mode
+Handles the hit-testing, hover and pressed states and the tooltips of the items itself,
+which avoids the per-widget and per-stylesheet overhead of thousands of QPushButtons
+Presses on the blank space are ignored, so they get to the parent (drag selection)
+'''
+class SelectorCanvas(QWidget):
+  def __init__(self, p):
+    super(SelectorCanvas, self).__init__(p)
+    self.order = {} # item => painting order, the last item is on top
+    self.lastOrder = 0
+    self.grid = indexes.SpatialGrid() # item rectangles for hit-testing and partial repaints
+    self.hovered = None # item under the mouse
+    self.pressed = None # item being clicked
+    self.setMouseTracking(True) # receive move events for hovering
+    self.resize(p.size())
+    self.show()
+
+  '''
+  Creates a new item painted by the canvas
+  '''
+  def addItem(self):
+    item = CanvasItem(self)
+    self.lastOrder += 1
+    self.order[item] = self.lastOrder
+    self.reindexItem(item)
+    return item
+
+  '''
+  Stops painting ~item~
+  '''
+  def removeItem(self, item):
+    if item in self.order:
+      del self.order[item]
+      self.grid.remove(item)
+      self.updateItem(item)
+    if self.hovered is item:
+      self.hovered = None
+    if self.pressed is item:
+      self.pressed = None
+
+  '''
+  Schedules repainting the area of ~item~
+  '''
+  def updateItem(self, item):
+    self.update(item.rect.adjusted(-1, -1, 1, 1)) # the outline is antialiased
+
+  '''
+  Updates the position of ~item~ in the grid
+  '''
+  def reindexItem(self, item):
+    rect = item.rect
+    self.grid.move(item, rect.left(), rect.top(), rect.right(), rect.bottom())
+
+  '''
+  Returns the visible items intersecting ~rect~ in painting order
+  '''
+  def itemsIn(self, rect):
+    items = self.grid.queryRect(rect.left(), rect.top(), rect.right(), rect.bottom())
+    return sorted((item for item in items if item.visible), key=self.order.get)
+
+  '''
+  Returns the top-most visible item at ~pos~ or None
+  '''
+  def itemAt(self, pos):
+    items = [item for item in self.grid.queryPoint(pos.x(), pos.y()) if item.visible]
+    if not items:
+      return None
+    return max(items, key=self.order.get)
+
+  def paintEvent(self, event):
+    painter = QPainter(self)
+    atlas = selectorAtlas()
+    for item in self.itemsIn(event.rect()): # only the items in the repainted area
+      if item is self.pressed and item is self.hovered:
+        state = SelectorAtlas.pressed
+      elif item is self.hovered:
+        state = SelectorAtlas.hover
+      else:
+        state = SelectorAtlas.normal
+      painter.drawPixmap(item.rect.topLeft(), atlas.sprite(item.color, item.rect.width(), item.selected, state))
+
+  '''
+  Switches the hovered item to ~item~
+  '''
+  def setHovered(self, item):
+    if item is self.hovered:
+      return
+
+    if self.hovered is not None:
+      self.updateItem(self.hovered)
+    self.hovered = item
+    if item is not None:
+      self.updateItem(item)
+
+  def mousePressEvent(self, event):
+    item = self.itemAt(event.pos()) if event.button() == Qt.LeftButton else None
+    if item is None: # blank space => let the parent handle it
+      event.ignore()
+      return
+
+    self.pressed = item
+    self.updateItem(item)
+
+  def mouseMoveEvent(self, event):
+    self.setHovered(self.itemAt(event.pos()))
+    if self.pressed is None:
+      event.ignore()
+
+  def mouseReleaseEvent(self, event):
+    item = self.pressed
+    if item is None or event.button() != Qt.LeftButton:
+      event.ignore()
+      return
+
+    self.pressed = None
+    self.updateItem(item)
+    if self.itemAt(event.pos()) is item: # released over the pressed item => clicked (as QPushButton does)
+      item.clicked.emit()
+
+  def leaveEvent(self, event):
+    self.setHovered(None)
+
+  '''
+  Shows the tooltip of the item under the mouse
+  '''
+  def event(self, event):
+    if event.type() == QEvent.ToolTip:
+      item = self.itemAt(event.pos())
+      if item is not None and item.tooltip:
+        QToolTip.showText(event.globalPos(), item.tooltip, self)
+      else:
+        QToolTip.hideText()
+        event.ignore()
+      return True
+    return super(SelectorCanvas, self).event(event)
+
+
+@registerControl
 class CommandButton(BaseControl):
   clicked = Signal()
+  TYPE = "command_button"
+  CODE = 2
+  TRIGGER = "clicked"
+  FIELDS = [
+    Field("cmd", "string", DEFAULT_COMMAND_BUTTON_CODE),
+    Field("label", "string", "Command"),
+    Field("tags", "strings", ()),
+    Field("height", "int", 20),
+    Field("width", "int", 60),
+    Field("tooltip", "string", "")
+  ]
 
   def __init__(self, p, **kwargs):
     super(CommandButton, self).__init__()
@@ -186,39 +670,6 @@ class CommandButton(BaseControl):
   def onWidgetTriggered(self):
     self.clicked.emit()
 
-  '''
-  Returns JSON representation of the control
-  '''
-  def serialize(self):
-    return {
-    "command_button": {
-        "cid": self.cid,
-        "cmd": self.cmd,
-        "label": self.label,
-        "pos_x": self.pos.x(),
-        "pos_y": self.pos.y(),
-        "tags": self.tags,
-        "height": self.height,
-        "width": self.width,
-        "tooltip": self.tooltip
-      }
-    }
-
-  '''
-  Loads the control from JSON representation
-  '''
-  def deserialize(self, json, duplicate=False):
-    if not duplicate:
-      self.cid = json["cid"]
-      self.pos = QPoint(json["pos_x"], json["pos_y"])
-
-    self.cmd = json["cmd"]
-    self.label = json["label"]
-    self.tags = json["tags"]
-    self.height = json["height"]
-    self.width = json["width"]
-    self.tooltip = json["tooltip"]
-
   '''
   Apply the settings to control
   '''
@@ -244,9 +695,24 @@ class CommandButton(BaseControl):
     self.function() # run the assigned code
 
 
+@registerControl
 class Slider(BaseControl):
   valueChanged = Signal()
   released = Signal()
+  TYPE = "slider"
+  CODE = 1
+  TRIGGER = "released"
+  FIELDS = [
+    Field("is_vertical", "bool", True),
+    Field("target_attr", "string", ""),
+    Field("min_attr_val", "float", 0.0),
+    Field("max_attr_val", "float", 0.0),
+    Field("clamp_to_int", "bool", False),
+    Field("tags", "strings", ()),
+    Field("default_val", "int", 0), # percent, as set by the slider setup dialog
+    Field("tooltip", "string", ""),
+    Field("length", "int", 80)
+  ]
 
   def __init__(self, p, **kwargs):
     super(Slider, self).__init__()
@@ -259,7 +725,7 @@ class Slider(BaseControl):
     self.clamp_to_int = False
     self.tags = []
     self.is_vertical = True
-    self.default_val = False
+    self.default_val = 0
     self.tooltip = ""
     self.width = 15
     self.length = 80
@@ -292,45 +758,6 @@ class Slider(BaseControl):
     else:
       self.widget.resize(self.length, self.width)     
 
-  '''
-  Returns JSON representation of the control
-  '''
-  def serialize(self):
-    return {
-      "slider": {
-        "cid": self.cid,
-        "is_vertical": self.is_vertical,
-        "target_attr": self.target_attr,
-        "min_attr_val": self.min_attr_val,
-        "max_attr_val": self.max_attr_val,
-        "clamp_to_int": self.clamp_to_int,
-        "pos_x": self.pos.x(),
-        "pos_y": self.pos.y(),
-        "tags": self.tags,
-        "default_val": self.default_val,
-        "tooltip": self.tooltip,
-        "length": self.length
-        }
-    }
-
-  '''
-  Loads the control from JSON representation
-  '''
-  def deserialize(self, json, duplicate=False):
-    if not duplicate:
-      self.cid = json["cid"]
-      self.pos = QPoint(json["pos_x"], json["pos_y"])
-
-    self.is_vertical = json["is_vertical"]
-    self.target_attr = json["target_attr"]
-    self.min_attr_val = json["min_attr_val"]
-    self.max_attr_val = json["max_attr_val"]
-    self.clamp_to_int = json["clamp_to_int"]
-    self.tags = json["tags"]
-    self.default_val = json["default_val"]
-    self.tooltip = json["tooltip"]
-    self.length = json.get("length", 80)
-
   '''
   Apply current settings
   '''
@@ -339,6 +766,7 @@ class Slider(BaseControl):
     self.move(self.pos) # move into place
 
     if client: # if loaded by CUI Viewer
+      self.invalidate() # the widget no longer displays the attribute value
       self.widget.setValue(self.default_val)
       self.widget.setToolTip(self.tooltip)
       self.valueChanged.connect(self.valueChangedAction)
@@ -350,6 +778,8 @@ class Slider(BaseControl):
   Process the slider move event by updating the assigned attribute
   '''
   def valueChangedAction(self):
+    self.invalidate() # moved by user, the cached value is not displayed anymore
+
     if not self.target_attr: # if nothing assigned
       pm.warning("No attribute assigned to this slider")
       return
@@ -367,24 +797,45 @@ class Slider(BaseControl):
   def releasedAction(self):
     utils.undoable_close() # when slider is released - free the undo chunk
 
+  def syncedAttr(self):
+    return self.target_attr or None
+
   '''
-  Update the control to match current attribute value
+  Update the control to match the attribute value ~attrVal~
   '''
-  def updateControl(self):
-    range_ = self.max_attr_val - self.min_attr_val # offset between max and min
-    try:
-      attrVal = pm.getAttr(self.target_attr) # get the current value
-    except Exception: # if attribute is not accessible or does not exist
-      return
+  def applyValue(self, attrVal):
+    if not self.isNewValue(attrVal): # nothing to do if the slider position has not moved
+      return False
 
-    val = (attrVal - self.min_attr_val)/(range_/100) # calculate the percent value for slider
     self.widget.blockSignals(True) # block signals to avoid the unwanted attribute update
-    self.widget.setValue(round(val)) # set slider value rounding it to nearest integer
+    self.widget.setValue(self.cachedValue) # set slider position
     self.widget.blockSignals(False) # unblock the signals
+    return True
+
+  '''
+  Slider position (percent rounded to the nearest integer) of the attribute value ~attrVal~
+  '''
+  def displayedValue(self, attrVal):
+    range_ = self.max_attr_val - self.min_attr_val # offset between max and min
+    val = (attrVal - self.min_attr_val)/(range_/100) # calculate the percent value for slider
+    return int(round(val))
 
 
+@registerControl
 class CheckBox(BaseControl):
   stateChanged = Signal()
+  TYPE = "checkbox"
+  CODE = 3
+  TRIGGER = "stateChanged"
+  FIELDS = [
+    Field("cmd", "string", DEFAULT_CHECKBOX_CODE),
+    Field("is_dir_ctrl", "bool", True),
+    Field("target_attr", "string", ""),
+    Field("default_state", "bool", False),
+    Field("label", "string", "Checkbox"),
+    Field("tags", "strings", ()),
+    Field("tooltip", "string", "")
+  ]
 
   def __init__(self, p, **kwargs):
     super(CheckBox, self).__init__()
@@ -425,6 +876,7 @@ class CheckBox(BaseControl):
     
     if client: # if loaded by CUI Viewer
       self.widget.setToolTip(self.tooltip)
+      self.invalidate() # the widget no longer displays the attribute value
       self.widget.setChecked(self.default_state)
       self.stateChanged.connect(self.toggledAction)
     else:
@@ -434,6 +886,8 @@ class CheckBox(BaseControl):
   Process the checked/unchecked state update
   '''
   def toggledAction(self):
+    self.invalidate() # toggled by user, the cached value is not displayed anymore
+
     if self.is_dir_ctrl: # if controling an attribute directly
       if not self.target_attr: # if no attribute assigned
         pm.warning("No attribute assigned to this checkbox")
@@ -455,51 +909,22 @@ class CheckBox(BaseControl):
       else:
         self.off_cmd() # unchecked => run off()
 
-  '''
-  Returns the JSON representation of the control
-  '''
-  def serialize(self):
-    return {
-      "checkbox": {
-        "cid": self.cid,
-        "cmd": self.cmd,
-        "is_dir_ctrl": self.is_dir_ctrl,
-        "target_attr": self.target_attr,
-        "pos_x": self.pos.x(),
-        "pos_y": self.pos.y(),
-        "default_state": self.default_state,
-        "label": self.label,
-        "tags": self.tags,
-        "tooltip": self.tooltip
-      }
-    }
+  def syncedAttr(self):
+    if self.is_dir_ctrl and self.target_attr: # only direct control checkboxes mirror an attribute
+      return self.target_attr
+    return None
 
   '''
-  Loads the control from JSON representation
+  Update the state from Maya attribute value ~attrVal~
   '''
-  def deserialize(self, json, duplicate=False):
-    if not duplicate:
-      self.cid = json["cid"]
-      self.pos = QPoint(json["pos_x"], json["pos_y"])
-
-    self.cmd = json["cmd"]
-    self.is_dir_ctrl = json["is_dir_ctrl"]
-    self.target_attr = json["target_attr"]
-    self.default_state = json["default_state"]
-    self.label = json["label"]
-    self.tags = json["tags"]
-    self.tooltip = json["tooltip"]
+  def applyValue(self, attrVal):
+    if not self.is_dir_ctrl or not self.isNewValue(bool(attrVal)): # nothing to do if the state has not changed
+      return False
 
-  '''
-  Update the state from Maya attribute
-  '''
-  def updateControl(self):
-    if self.is_dir_ctrl: # if controling an attribute directly
-      try:
-        attrVal = pm.getAttr(self.target_attr) # get the attribute value
-      except Exception: # could not reach the assigned attribute
-        return
-      self.widget.setChecked(attrVal) # set the state according to received value
+    self.widget.blockSignals(True) # block signals to avoid writing the same value back
+    self.widget.setChecked(attrVal) # set the state according to received value
+    self.widget.blockSignals(False) # unblock the signals
+    return True
 
 
 '''
@@ -524,8 +949,19 @@ class CUILineEdit(QDoubleSpinBox):
       event.ignore()
 
 
+@registerControl
 class FloatField(BaseControl):
   focused = Signal()
+  TYPE = "float_field"
+  CODE = 4
+  TRIGGER = "focused"
+  FIELDS = [
+    Field("target_attr", "string", ""),
+    Field("w", "int", 75),
+    Field("h", "int", 20),
+    Field("tags", "strings", ()),
+    Field("tooltip", "string", "")
+  ]
 
   def __init__(self, p, **kwargs):
     super(FloatField, self).__init__()
@@ -548,31 +984,6 @@ class FloatField(BaseControl):
   def onFocused(self):
     self.focused.emit()
 
-  def serialize(self):
-    return {
-      "float_field": {
-        "cid": self.cid,
-        "target_attr": self.target_attr,
-        "pos_x": self.pos.x(),
-        "pos_y": self.pos.y(),
-        "w": self.w,
-        "h": self.h,
-        "tags": self.tags,
-        "tooltip": self.tooltip
-      }
-    }
-
-  def deserialize(self, json, duplicate=False):
-    if not duplicate:
-      self.cid = json["cid"]
-      self.pos = QPoint(json["pos_x"], json["pos_y"])
-
-    self.w = json["w"]
-    self.h = json["h"]
-    self.target_attr = json["target_attr"]
-    self.tags = json["tags"]
-    self.tooltip = json["tooltip"]
-
   def setup(self, client=False):
     self.widget.resize(self.w, self.h) # resize according to settings
     self.move(self.pos) # move into place
@@ -583,14 +994,25 @@ class FloatField(BaseControl):
       self.widget.setToolTip("Control ID: {}".format(self.cid)) # set cid as tooltip
 
   def valueChangedAction(self):
+    self.invalidate() # edited by user, the cached value is not displayed anymore
     val = self.widget.value() # convert value to float
     pm.setAttr(self.target_attr, val) # set new value to attribute
 
-  def updateControl(self):
-    try:
-      val = pm.getAttr(self.target_attr) # get the attribute value
-    except Exception: # abort if attribute unreachable
-      return
+  def syncedAttr(self):
+    return self.target_attr or None
+
+  def applyValue(self, val):
+    if not self.isNewValue(val): # nothing to do if the value has not moved
+      return False
+
+    self.widget.blockSignals(True) # block signals to avoid writing the same value back
+    self.widget.setValue(self.cachedValue) # display new value
+    self.widget.blockSignals(False) # unblock the signals
+    return True
 
-    self.widget.setValue(val) # display new value
+  '''
+  The attribute value ~val~ rounded to the displayed decimals
+  '''
+  def displayedValue(self, val):
+    return round(val, self.widget.decimals())
 